@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import event
+
+from backend.batching import MessageBatcher
+from backend.database.schema import DBAccount, DBChat, DBChatMembership
+from backend.exceptions import ChatMembershipRequired
+from backend.models.chats import MessageCreate
+
+
+@pytest.fixture
+def chat(session):
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password="chatty123"))
+    session.add(DBAccount(username="yappy", email="yappy@email.com", hashed_password="yappy321"))
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.commit()
+
+def test_messages_commit_together(session, chat):
+    engine = session.get_bind()
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(connection))
+    batcher = MessageBatcher(batch_size=10, delay=0.2)
+
+    futures = [batcher.submit(engine, 1, MessageCreate(text=f"message {i}", account_id=1), 1) for i in range(3)]
+    rejected = batcher.submit(engine, 1, MessageCreate(text="intruder", account_id=2), 2)
+    messages = [future.result(timeout=5) for future in futures]
+    batcher.close()
+
+    assert [message.id for message in messages] == [1, 2, 3]
+    assert all(message.created_at is not None for message in messages)
+    assert isinstance(rejected.exception(timeout=5), ChatMembershipRequired)
+    assert len(commits) == 1
+    assert session.get(DBChat, 1).message_count == 3
+
+def test_batch_size_caps_a_transaction(session, chat):
+    engine = session.get_bind()
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(connection))
+    batcher = MessageBatcher(batch_size=2, delay=0.2)
+
+    futures = [batcher.submit(engine, 1, MessageCreate(text=f"message {i}", account_id=1), 1) for i in range(4)]
+    [future.result(timeout=5) for future in futures]
+    batcher.close()
+
+    assert len(commits) == 2
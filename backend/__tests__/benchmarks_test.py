@@ -0,0 +1,45 @@
+import pytest
+
+from backend.benchmarks import compare, run_benchmarks, summarize
+
+
+def test_summarize():
+    result = summarize([0.001 * i for i in range(1, 101)], 5.05)
+
+    assert result["count"] == 100
+    assert round(result["p50_ms"]) == 51
+    assert round(result["p99_ms"]) == 99
+    assert round(result["max_ms"]) == 100
+    assert round(result["throughput_rps"]) == 20
+
+def test_compare():
+    baseline = {"benchmarks": {"login": {"p50_ms": 10.0}, "list_members": {"p50_ms": 4.0}}}
+    results = {"benchmarks": {
+        "login": {"p50_ms": 11.0},
+        "list_members": {"p50_ms": 6.0},
+        "delete_chat": {"p50_ms": 50.0},
+    }}
+
+    regressions = compare(results, baseline, threshold=0.2)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("list_members")
+
+def test_run_benchmarks():
+    results = run_benchmarks(iterations=2, warmup=1, chat_sizes=(5, 20))
+
+    assert set(results["benchmarks"]) == {
+        "login", "post_message", "list_messages_5", "list_messages_20", "list_members", "delete_chat",
+    }
+    assert results["environment"]["database"] == "memory"
+    assert results["environment"]["mode"] == "sync"
+    assert compare(results, results, threshold=0) == []
+
+def test_run_benchmarks_async():
+    results = run_benchmarks(database="file", iterations=2, warmup=1, chat_sizes=(5,), mode="async")
+
+    assert results["environment"]["mode"] == "async"
+    assert results["benchmarks"]["post_message"]["count"] == 2
+
+    with pytest.raises(ValueError):
+        run_benchmarks(database="memory", mode="async")
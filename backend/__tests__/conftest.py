@@ -1,10 +1,21 @@
+from contextlib import contextmanager
+
+import asyncio
+
 import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, SQLModel, StaticPool, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.testclient import TestClient
 
 from backend import app
+from backend import dependencies
+from backend.database.engine import async_url
 from backend.database.schema import *
-from backend.dependencies import get_session
+from backend.database.token_cache import token_cache
+from backend.dependencies import get_db_session, get_session
 
 @pytest.fixture
 def session():
@@ -25,4 +36,77 @@ def client(session):
 
     app.dependency_overrides[get_session] = _get_session_override
     yield TestClient(app)
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+    token_cache.clear()
+
+@pytest.fixture
+def file_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def file_session(file_engine):
+    with Session(file_engine) as session:
+        yield session
+
+
+@pytest.fixture
+def async_client(file_engine, monkeypatch):
+    """Test client whose handlers get async sessions, as with `DB_ASYNC=true`.
+
+    The async engine opens the same SQLite file as `file_engine`, which stands in
+    for the application's sync engine: the password routes use it, and so does
+    work handed off the event loop, such as batched writes and exports. Seed
+    data with `file_session`.
+    """
+
+    async_engine = create_async_engine(async_url(file_engine.url), poolclass=NullPool)
+    monkeypatch.setattr(dependencies, "engine", file_engine)
+
+    def _get_session_override():
+        with Session(file_engine, expire_on_commit=False) as session:
+            yield session
+
+    async def _get_db_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = _get_session_override
+    app.dependency_overrides[get_db_session] = _get_db_session_override
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    token_cache.clear()
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def query_budget(session):
+    """Fail the test if a block runs more statements than its budget.
+
+        with query_budget(3):
+            client.post(...)
+    """
+
+    @contextmanager
+    def budget(limit: int):
+        statements = []
+
+        def count(connection, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = session.get_bind()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        if len(statements) > limit:
+            pytest.fail(
+                f"{len(statements)} queries over a budget of {limit}:\n" + "\n".join(statements),
+                pytrace=False,
+            )
+
+    return budget
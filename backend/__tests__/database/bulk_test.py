@@ -0,0 +1,63 @@
+from sqlmodel import select
+
+from backend.config import settings
+from backend.database import accounts as db_accounts
+from backend.database import chats as db_chats
+from backend.database.bulk import in_chunks
+from backend.database.schema import DBAccount, DBChat, DBChatMembership, DBMessage, DBMessageChange
+
+
+def _populate(session):
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password="chatty123"))
+    session.add(DBAccount(username="yappy", email="yappy@email.com", hashed_password="yappy321"))
+    session.add(DBChat(name="chatty", owner_id=1, member_count=2))
+    session.add(DBChat(name="yappy", owner_id=1, member_count=2))
+    for chat_id in [1, 2]:
+        session.add(DBChatMembership(account_id=1, chat_id=chat_id))
+        session.add(DBChatMembership(account_id=2, chat_id=chat_id))
+        for i in range(5):
+            session.add(DBMessage(text=f"message {i}", account_id=1 + i % 2, chat_id=chat_id))
+    session.commit()
+
+def test_in_chunks_commits_each_chunk(session):
+    _populate(session)
+    chunks = []
+
+    def record(session, ids):
+        chunks.append(ids if isinstance(ids, list) else "rest")
+        for message in session.exec(select(DBMessage).where(DBMessage.id.in_(ids))):
+            message.chat_id = 2
+
+    in_chunks(session, select(DBMessage.id).where(DBMessage.chat_id == 1), record, chunk_size=2)
+    assert chunks == [[1, 2], [3, 4], [5], "rest"]
+
+def test_delete_chat_in_chunks(session, monkeypatch):
+    monkeypatch.setattr(settings, "db_bulk_chunk_size", 2)
+    _populate(session)
+
+    db_chats.delete_chat(session, 1)
+
+    assert session.exec(select(DBChat.id)).all() == [2]
+    assert session.exec(select(DBMessage.chat_id).distinct()).all() == [2]
+    assert session.exec(select(DBChatMembership.chat_id).distinct()).all() == [2]
+
+def test_delete_membership_in_chunks(session, monkeypatch):
+    monkeypatch.setattr(settings, "db_bulk_chunk_size", 2)
+    _populate(session)
+
+    db_chats.delete_membership(session, 1, 2)
+
+    authors = session.exec(select(DBMessage.account_id).where(DBMessage.chat_id == 1)).all()
+    assert authors == [1, None, 1, None, 1]
+    assert len(session.exec(select(DBMessageChange).where(DBMessageChange.chat_id == 1)).all()) == 2
+    assert session.get(DBChat, 1).member_count == 1
+
+def test_delete_account_in_bulk(session):
+    _populate(session)
+
+    db_accounts.delete_account(session, 2)
+
+    assert session.exec(select(DBMessage.account_id).where(DBMessage.account_id == 2)).all() == []
+    assert session.exec(select(DBChatMembership.account_id).distinct()).all() == [1]
+    assert session.get(DBAccount, 2) is None
+    assert session.get(DBChat, 2).member_count == 1
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from backend.database import chats as db_chats
+from backend.database import counters as db_counters
+from backend.database.schema import DBAccount, DBChat, DBChatMembership, DBMessage
+from backend.models.chats import ChatCreate, ChatMembershipCreate, MessageCreate
+
+
+def _counters(session, chat_id):
+    chat = session.get(DBChat, chat_id)
+    return chat.message_count, chat.member_count, chat.last_message_id
+
+def test_counters_follow_writes(session):
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password="chatty123"))
+    session.add(DBAccount(username="yappy", email="yappy@email.com", hashed_password="yappy321"))
+    session.commit()
+
+    db_chats.create_chat(session, ChatCreate(name="chatty", owner_id=1), 1)
+    assert _counters(session, 1) == (0, 1, None)
+
+    db_chats.add_membership(session, 1, ChatMembershipCreate(account_id=2))
+    for text in ["one", "two", "three"]:
+        db_chats.add_message(session, 1, MessageCreate(text=text, account_id=1), 1)
+    assert _counters(session, 1) == (3, 2, 3)
+
+    db_chats.delete_message(session, 1, 3)
+    assert _counters(session, 1) == (2, 2, 2)
+    db_chats.delete_message(session, 1, 1)
+    assert _counters(session, 1) == (1, 2, 2)
+
+    db_chats.delete_membership(session, 1, 2)
+    assert _counters(session, 1) == (1, 1, 2)
+
+def test_recompute(session):
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChat(name="yappy", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.add(DBMessage(text="later", account_id=1, chat_id=1, created_at=datetime(2025, 2, 1)))
+    session.add(DBMessage(text="earlier", account_id=1, chat_id=1, created_at=datetime(2025, 1, 1)))
+    session.commit()
+
+    assert db_counters.recompute(session) == 2
+    assert _counters(session, 1) == (2, 1, 1)
+    assert session.get(DBChat, 1).last_message_at == datetime(2025, 2, 1)
+    assert _counters(session, 2) == (0, 0, None)
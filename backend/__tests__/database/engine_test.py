@@ -0,0 +1,43 @@
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from backend.config import Settings
+from backend.database.engine import (
+    TimedAsyncQueuePool,
+    TimedQueuePool,
+    async_url,
+    create_engine_from_settings,
+    engine_options,
+    is_sqlite,
+)
+
+
+def test_file_sqlite_engine_uses_settings(tmp_path):
+    settings = Settings(db_url=f"sqlite:///{tmp_path / 'test.db'}", db_pool_size=3, db_max_overflow=1)
+    engine = create_engine_from_settings(settings)
+
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 3
+    assert not engine.echo
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    engine.dispose()
+
+def test_memory_sqlite_engine_uses_static_pool():
+    options = engine_options(Settings(), "sqlite://")
+
+    assert options["poolclass"] is StaticPool
+    assert "pool_size" not in options
+
+def test_postgres_options():
+    settings = Settings(db_url="postgresql+psycopg://pony@localhost/pony", db_pool_size=20, db_pool_pre_ping=True)
+    options = engine_options(settings, settings.db_url)
+
+    assert not is_sqlite(settings)
+    assert "connect_args" not in options
+    assert options["pool_size"] == 20
+    assert options["poolclass"] is TimedQueuePool
+    assert engine_options(settings, settings.db_url, is_async=True)["poolclass"] is TimedAsyncQueuePool
+    assert options["pool_pre_ping"]
+    assert async_url(settings.db_url).drivername == "postgresql+psycopg"
+    assert async_url("sqlite:///test.db").drivername == "sqlite+aiosqlite"
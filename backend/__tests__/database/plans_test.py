@@ -0,0 +1,30 @@
+from backend.database.plans import HOT_QUERIES, explain, find_full_scans, is_full_scan
+
+
+def test_hot_queries_use_indexes(session):
+    connection = session.connection()
+
+    assert find_full_scans(connection) == {}
+
+def test_messages_page_does_not_sort(session):
+    connection = session.connection()
+
+    details = explain(connection, HOT_QUERIES["messages_page"]())
+    assert not any("TEMP B-TREE" in detail for detail in details)
+
+def test_inbox_reads_only_unread_messages(session):
+    connection = session.connection()
+
+    details = explain(connection, HOT_QUERIES["inbox"]())
+    assert any(
+        detail.startswith("SEARCH messages") and "(chat_id=? AND id>?)" in detail
+        for detail in details
+    )
+
+def test_is_full_scan():
+    assert is_full_scan("SCAN messages")
+    assert is_full_scan("SCAN messages USING INDEX ix_messages_chat_id_created_at_id")
+    assert is_full_scan("SCAN chat_memberships USING COVERING INDEX ix_chat_memberships_chat_id_account_id")
+    assert not is_full_scan("SEARCH chats USING INDEX ix_chats_name (name=?)")
+    assert not is_full_scan("SCAN CONSTANT ROW")
+    assert not is_full_scan("SCAN anon_1")
@@ -0,0 +1,24 @@
+from sqlmodel import select
+
+from backend.database.profiling import track_queries
+from backend.database.schema import DBAccount
+
+
+def test_track_queries(session):
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password="chatty123"))
+    session.commit()
+
+    session.exec(select(DBAccount)).all()
+    with track_queries() as stats:
+        for account_id in range(3):
+            session.get(DBAccount, account_id + 10)
+        session.exec(select(DBAccount)).all()
+
+    assert stats.count == 4
+    assert stats.duration > 0
+    [(statement, count)] = stats.repeated(3)
+    assert "WHERE accounts.id = ?" in statement and count == 3
+    assert stats.server_timing().endswith('desc="4 queries"')
+
+    session.exec(select(DBAccount)).all()
+    assert stats.count == 4
@@ -0,0 +1,42 @@
+import io
+import json
+
+from sqlmodel import func, select
+
+from backend.database.generate import generate
+from backend.database.schema import DBAccount, DBChat, DBChatMembership, DBMessage
+from backend.database.seed import iter_sections, seed
+
+DUMP = {
+    "accounts": [{"id": 1, "username": "chatty", "email": "chatty@email.com", "hashed_password": "x"}],
+    "chats": [{"id": 1, "name": "chatty", "owner_id": 1}],
+    "messages": [
+        {"id": i, "text": f"message {i}", "account_id": 1, "chat_id": 1, "created_at": f"2025-01-01T00:00:{i:02d}"}
+        for i in range(1, 6)
+    ],
+    "memberships": [{"account_id": 1, "chat_id": 1}],
+}
+
+def test_iter_sections_streams_across_reads():
+    rows = list(iter_sections(io.StringIO(json.dumps(DUMP, indent=2)), read_size=7))
+
+    assert [section for section, _ in rows] == ["accounts", "chats"] + ["messages"] * 5 + ["memberships"]
+    assert rows[2][1]["text"] == "message 1"
+
+def test_seed_is_idempotent(session):
+    for _ in range(2):
+        counts = seed(session, io.StringIO(json.dumps(DUMP)), chunk_size=2)
+
+    assert counts == {"accounts": 1, "chats": 1, "messages": 5, "memberships": 1}
+    assert session.exec(select(func.count()).select_from(DBMessage)).one() == 5
+    assert session.get(DBChat, 1).message_count == 5
+
+def test_generate(session):
+    counts = generate(session, accounts=30, chats=10, members_per_chat=4, messages_per_chat=20, seed=1, chunk_size=50)
+
+    assert counts["accounts"] == 30 and counts["chats"] == 10
+    assert session.exec(select(func.count()).select_from(DBMessage)).one() == counts["messages"]
+    assert session.exec(select(func.sum(DBChat.message_count))).one() == counts["messages"]
+    for chat in session.exec(select(DBChat)):
+        assert session.get(DBChatMembership, {"account_id": chat.owner_id, "chat_id": chat.id}) is not None
+    assert session.get(DBAccount, 30).username == "user30"
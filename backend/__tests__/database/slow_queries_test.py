@@ -0,0 +1,49 @@
+import json
+
+from sqlmodel import select
+
+from backend.config import settings
+from backend.database.profiling import track_queries
+from backend.database.schema import DBAccount, DBMessage
+from backend.database.slow_queries import redact
+
+
+def test_redact():
+    assert redact((1, "hunter2", None, 2.5, True)) == [1, "<str:7>", None, 2.5, True]
+    assert redact({"email": "a@b.c", "id": 3}) == {"email": "<str:5>", "id": 3}
+
+def test_slow_queries_are_logged_with_plans(session, monkeypatch, tmp_path):
+    log = tmp_path / "slow.log"
+    monkeypatch.setattr(settings, "db_slow_query_threshold", 0)
+    monkeypatch.setattr(settings, "db_slow_query_log", str(log))
+    scope = {"type": "http", "path": "/chats/1/messages"}
+
+    with track_queries(scope):
+        session.exec(select(DBMessage).where(DBMessage.chat_id == 1, DBMessage.text == "secret")).all()
+    session.exec(select(DBAccount).where(DBAccount.username == "chatty")).all()
+
+    entries = [json.loads(line) for line in log.read_text().splitlines()]
+    assert len(entries) == 2
+    messages, accounts = entries
+    assert messages["route"] == "/chats/1/messages"
+    assert messages["level"] == "WARNING"
+    assert messages["statement"].startswith("SELECT")
+    assert messages["parameters"] == [[1, "<str:6>"]]
+    assert any("messages" in step for step in messages["plan"])
+    assert accounts["route"] is None
+    assert "secret" not in log.read_text()
+
+    monkeypatch.setattr(settings, "db_slow_query_threshold", None)
+    session.exec(select(DBAccount)).all()
+    assert len(log.read_text().splitlines()) == 2
+
+def test_slow_queries_use_the_logger_by_default(session, monkeypatch, tmp_path, caplog):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "db_slow_query_threshold", 0)
+
+    with caplog.at_level("WARNING", logger="backend.database.slow_queries"):
+        session.exec(select(DBAccount).where(DBAccount.username == "chatty")).all()
+
+    [record] = caplog.records
+    assert record.entry["parameters"] == [["<str:6>"]]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend.database.sqlite import apply_pragma_profile, get_pragmas
+
+
+def test_pragmas_apply_to_every_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    apply_pragma_profile(engine, "production", {"busy_timeout": 1234})
+
+    with engine.connect() as first, engine.connect() as second:
+        for connection in [first, second]:
+            assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+            assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+    engine.dispose()
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        get_pragmas("turbo")
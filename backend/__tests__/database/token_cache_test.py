@@ -0,0 +1,64 @@
+import time
+
+from backend.database.schema import DBAccount
+from backend.database.token_cache import TokenCache
+from backend.models.auth import Claims
+
+
+def _claims(account_id, exp):
+    return Claims(sub=str(account_id), iss="test", iat=0, exp=exp)
+
+def test_get_returns_snapshot():
+    cache = TokenCache(maxsize=2)
+    cache.put("token", _claims(1, int(time.time()) + 60), DBAccount(id=1, username="chatty", email="chatty@email.com"))
+
+    account = cache.get("token").account()
+    assert (account.id, account.username, account.email) == (1, "chatty", "chatty@email.com")
+    assert cache.get("other") is None
+
+def test_expired_entries_are_dropped():
+    cache = TokenCache(maxsize=2)
+    cache.put("token", _claims(1, int(time.time()) - 1), DBAccount(id=1, username="chatty", email="chatty@email.com"))
+
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+def test_least_recently_used_is_evicted():
+    cache = TokenCache(maxsize=2)
+    exp = int(time.time()) + 60
+    for i in range(1, 4):
+        if i == 3:
+            cache.get("token1")
+        cache.put(f"token{i}", _claims(i, exp), DBAccount(id=i, username=f"user{i}", email=f"user{i}@email.com"))
+
+    assert cache.get("token1") is not None
+    assert cache.get("token2") is None
+    assert cache.get("token3") is not None
+
+def test_invalidate_account():
+    cache = TokenCache(maxsize=4)
+    exp = int(time.time()) + 60
+    cache.put("token1", _claims(1, exp), DBAccount(id=1, username="chatty", email="chatty@email.com"))
+    cache.put("token2", _claims(1, exp), DBAccount(id=1, username="chatty", email="chatty@email.com"))
+    cache.put("token3", _claims(2, exp), DBAccount(id=2, username="yappy", email="yappy@email.com"))
+
+    cache.invalidate_account(1)
+    assert cache.get("token1") is None
+    assert cache.get("token2") is None
+    assert cache.get("token3") is not None
+
+def test_put_after_invalidation_is_dropped():
+    cache = TokenCache(maxsize=4)
+    exp = int(time.time()) + 60
+    # a request reads the generation and loads the account...
+    generation = cache.generation(1)
+    snapshot = DBAccount(id=1, username="chatty", email="chatty@email.com")
+    # ...while another one deletes it
+    cache.invalidate_account(1)
+    cache.put("token1", _claims(1, exp), snapshot, generation)
+    assert cache.get("token1") is None
+
+    # loaded after the invalidation: cached
+    generation = cache.generation(1)
+    cache.put("token1", _claims(1, exp), snapshot, generation)
+    assert cache.get("token1") is not None
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, StaticPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.database import chats as db_chats
+from backend import dependencies
+from backend.config import settings
+from backend.database.schema import DBAccount, DBChat, DBChatMembership
+from backend.dependencies import create_db_tables, run_db
+from backend.models.chats import MessageCreate
+
+
+def test_run_db_with_sync_session(session):
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.commit()
+
+    chat = asyncio.run(run_db(session, db_chats.get_by_id, 1))
+    assert chat.name == "chatty"
+
+def test_run_db_with_async_session():
+    async def scenario():
+        engine = create_async_engine(
+            "sqlite+aiosqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password="chatty123"))
+            session.add(DBChat(name="chatty", owner_id=1))
+            session.add(DBChatMembership(account_id=1, chat_id=1))
+            await session.commit()
+
+            message = await run_db(session, db_chats.add_message, 1, MessageCreate(text="hello", account_id=1), 1)
+            messages, has_more = await run_db(session, db_chats.get_messages_page, 1, 10)
+        await engine.dispose()
+        return message, messages, has_more
+
+    message, messages, has_more = asyncio.run(scenario())
+    assert message.id == 1
+    assert [m.text for m in messages] == ["hello"]
+    assert not has_more
+
+def test_create_db_tables_fills_in_added_counters(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # as a database created before chats kept counters
+        for column in ("message_count", "member_count", "last_message_id", "last_message_at"):
+            connection.execute(text(f"ALTER TABLE chats DROP COLUMN {column}"))
+        connection.execute(text("INSERT INTO accounts (id, username, email, hashed_password) VALUES (1, 'chatty', 'chatty@email.com', 'x'), (2, 'yappy', 'yappy@email.com', 'x')"))
+        connection.execute(text("INSERT INTO chats (id, name, owner_id) VALUES (1, 'busy', 1), (2, 'quiet', 1)"))
+        connection.execute(text("INSERT INTO chat_memberships (account_id, chat_id) VALUES (1, 1), (2, 1), (1, 2)"))
+        connection.execute(text(
+            "INSERT INTO messages (id, text, account_id, chat_id, created_at) VALUES "
+            "(1, 'hi', 1, 1, '2024-01-01 00:00:00'), (2, 'hello', 2, 1, '2024-01-02 00:00:00')"
+        ))
+    monkeypatch.setattr(dependencies, "engine", engine)
+    monkeypatch.setattr(settings, "db_check_query_plans", False)
+
+    create_db_tables()
+
+    with Session(engine) as session:
+        busy, quiet = session.get(DBChat, 1), session.get(DBChat, 2)
+        assert (busy.message_count, busy.member_count, busy.last_message_id) == (2, 2, 2)
+        assert busy.last_message_at == datetime(2024, 1, 2)
+        assert (quiet.message_count, quiet.member_count, quiet.last_message_id, quiet.last_message_at) == (0, 1, None, None)
+    engine.dispose()
@@ -2,6 +2,7 @@ import pytest
 from starlette.testclient import TestClient
 
 from backend import app
+from backend.config import settings
 
 
 @pytest.fixture
@@ -15,3 +16,42 @@ def client():
 def test_status(client):
     response = client.get("/status")
     assert response.status_code == 204
+
+def test_server_timing_is_opt_in(client, monkeypatch):
+    response = client.get("/jobs/123456789")
+    assert "server-timing" not in response.headers
+
+    monkeypatch.setattr(settings, "db_query_stats", True)
+    response = client.get("/jobs/123456789")
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+def _scrape(client) -> dict[str, float]:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+def test_metrics(client):
+    before = _scrape(client)
+    client.get("/status")
+    client.get("/jobs/123456789")
+    client.get("/no/such/path")
+    after = _scrape(client)
+
+    def delta(name):
+        return after[name] - before.get(name, 0)
+
+    assert delta('http_requests_total{method="GET",route="/status",status="204"}') == 1
+    assert delta('http_requests_total{method="GET",route="/jobs/{job_id}",status="404"}') == 1
+    assert delta('http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert delta('http_request_duration_seconds_count{method="GET",route="/status"}') == 1
+    assert delta('http_request_duration_seconds_bucket{method="GET",route="/status",le="+Inf"}') == 1
+    # the scrape itself is in flight
+    assert after["http_requests_in_flight"] == 1
+    assert after["password_queue_depth"] == 0
+    assert delta("db_pool_checkout_wait_seconds_count") >= 1
@@ -0,0 +1,46 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from backend.realtime import ChatHub, SlowConsumer
+
+
+def test_publish_fans_out_to_chat_subscribers():
+    async def scenario():
+        hub = ChatHub(queue_size=4)
+        first, second, other = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+
+        hub.publish(1, {"type": "message_created"})
+        assert json.loads(await first.get()) == {"type": "message_created"}
+        assert json.loads(await second.get()) == {"type": "message_created"}
+        assert other.queue.empty()
+
+    asyncio.run(scenario())
+
+def test_publish_from_another_thread():
+    async def scenario():
+        hub = ChatHub(queue_size=4)
+        subscription = hub.subscribe(1)
+
+        thread = threading.Thread(target=hub.publish, args=(1, {"type": "message_deleted"}))
+        thread.start()
+        thread.join()
+        return json.loads(await asyncio.wait_for(subscription.get(), timeout=1))
+
+    assert asyncio.run(scenario()) == {"type": "message_deleted"}
+
+def test_slow_consumer_is_evicted():
+    async def scenario():
+        hub = ChatHub(queue_size=2)
+        subscription = hub.subscribe(1)
+
+        for i in range(3):
+            hub.publish(1, {"type": "message_created", "id": i})
+        assert subscription.evicted
+        assert hub.subscriber_count(1) == 0
+        with pytest.raises(SlowConsumer):
+            await subscription.get()
+
+    asyncio.run(scenario())
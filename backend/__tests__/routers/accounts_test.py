@@ -1,4 +1,7 @@
-from backend.database.schema import DBAccount
+import bcrypt
+
+from backend.database import counters as db_counters
+from backend.database.schema import DBAccount, DBChat, DBChatMembership, DBMessage
 
 def test_get_nonexistent_account(session, client):
     chatty = "chatty"
@@ -68,4 +71,83 @@ def test_get_account_2(session, client):
 
     response = client.get("/accounts/2")
     assert response.status_code == 200
-    assert response.json() == {"id": 2, "username": yappy}
\ No newline at end of file
+    assert response.json() == {"id": 2, "username": yappy}
+
+def test_update_self_refreshes_cached_account(session, client):
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password=bcrypt.hashpw(b"chatty123", bcrypt.gensalt(4)).decode()))
+    session.commit()
+
+    response = client.post("/auth/token", data={"username": "chatty", "password": "chatty123"})
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    for _ in range(2):
+        response = client.get("/accounts/me", headers=headers)
+        assert response.json() == {"id": 1, "username": "chatty", "email": "chatty@email.com"}
+
+    response = client.put("/accounts/me", headers=headers, json={"username": "yappy"})
+    assert response.json() == {"id": 1, "username": "yappy", "email": "chatty@email.com"}
+
+    response = client.get("/accounts/me", headers=headers)
+    assert response.json() == {"id": 1, "username": "yappy", "email": "chatty@email.com"}
+
+def test_get_accounts_by_ids(session, client):
+    for username in ["chatty", "yappy", "quiet"]:
+        session.add(DBAccount(username=username, email=f"{username}@email.com", hashed_password=f"{username}123"))
+    session.commit()
+
+    response = client.get("/accounts", params={"ids": "3,1,100,1"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "metadata": {"count": 2},
+        "accounts": [
+            {"id": 1, "username": "chatty"},
+            {"id": 3, "username": "quiet"}
+        ]
+    }
+
+def test_get_accounts_by_invalid_ids(session, client):
+    response = client.get("/accounts", params={"ids": "1,two"})
+    assert response.status_code == 422
+    assert response.json() == {"error": "invalid_query_parameter", "message": "Invalid value for query parameter ids: 1,two"}
+
+def test_get_own_chats(session, client):
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password=bcrypt.hashpw(b"chatty123", bcrypt.gensalt(4)).decode()))
+    session.add(DBAccount(username="yappy", email="yappy@email.com", hashed_password="yappy321"))
+    session.add(DBChat(name="quiet", owner_id=1))
+    session.add(DBChat(name="busy", owner_id=1))
+    session.add(DBChat(name="elsewhere", owner_id=2))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=2))
+    session.add(DBChatMembership(account_id=2, chat_id=2))
+    session.add(DBChatMembership(account_id=2, chat_id=3))
+    session.add(DBMessage(text="hi", account_id=1, chat_id=2))
+    session.add(DBMessage(text="hello", account_id=2, chat_id=2))
+    session.add(DBMessage(text="anyone?", account_id=2, chat_id=2))
+    session.add(DBMessage(text="not mine", account_id=2, chat_id=3))
+    session.commit()
+    db_counters.recompute(session)
+
+    response = client.post("/auth/token", data={"username": "chatty", "password": "chatty123"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = client.get("/accounts/me/chats", headers=headers)
+    assert response.status_code == 200
+    chats = response.json()["chats"]
+    assert [(chat["id"], chat["unread_count"]) for chat in chats] == [(2, 2), (1, 0)]
+    assert chats[0]["last_message"]["text"] == "anyone?"
+    assert chats[1]["last_message"] is None
+
+    response = client.put("/accounts/me/chats/2/read", headers=headers, params={"message_id": 2})
+    assert response.json() == {"chat_id": 2, "last_read_message_id": 2}
+    response = client.get("/accounts/me/chats", headers=headers)
+    assert response.json()["chats"][0]["unread_count"] == 1
+
+    # past the chat's newest message: clamped to it
+    response = client.put("/accounts/me/chats/2/read", headers=headers, params={"message_id": 4})
+    assert response.json() == {"chat_id": 2, "last_read_message_id": 3}
+    response = client.get("/accounts/me/chats", headers=headers)
+    assert response.json()["chats"][0]["unread_count"] == 0
+
+    response = client.put("/accounts/me/chats/3/read", headers=headers)
+    assert response.status_code == 422
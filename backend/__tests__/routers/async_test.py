@@ -0,0 +1,98 @@
+"""The routes again, with handlers on async sessions (`DB_ASYNC=true`)."""
+
+import json
+
+import bcrypt
+
+from backend.config import settings
+from backend.database.schema import DBAccount, DBChat, DBChatMembership, DBMessage
+
+
+def _login(session, client, username):
+    password = f"{username}123"
+    session.add(DBAccount(username=username, email=f"{username}@email.com", hashed_password=bcrypt.hashpw(password.encode(), bcrypt.gensalt(4)).decode()))
+    session.commit()
+
+    response = client.post("/auth/token", data={"username": username, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _chat(session):
+    session.add(DBChat(name="chatty", owner_id=1, member_count=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.commit()
+
+
+def test_accounts(file_session, async_client):
+    headers = _login(file_session, async_client, "chatty")
+
+    response = async_client.get("/accounts/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == "chatty"
+
+    response = async_client.get("/accounts/", params={"ids": "1,2"})
+    assert response.json() == {"metadata": {"count": 1}, "accounts": [{"id": 1, "username": "chatty"}]}
+
+
+def test_chats_and_messages(file_session, async_client):
+    headers = _login(file_session, async_client, "chatty")
+    _chat(file_session)
+
+    response = async_client.post("/chats/1/messages", headers=headers, json={"text": "hello", "account_id": 1})
+    assert response.status_code == 201
+    assert response.json()["id"] == 1
+
+    response = async_client.put("/chats/1/messages/1", json={"text": "hello there"})
+    assert response.status_code == 200
+
+    response = async_client.get("/chats/1/messages", params={"expand": "authors"})
+    assert response.status_code == 200
+    [message] = response.json()["messages"]
+    assert (message["text"], message["username"]) == ("hello there", "chatty")
+
+    response = async_client.get("/chats/")
+    assert response.json()["chats"][0]["message_count"] == 1
+
+    response = async_client.get("/accounts/me/chats", headers=headers)
+    assert response.json()["chats"][0]["last_message"]["text"] == "hello there"
+
+    response = async_client.get("/chats/1/messages/search", params={"q": "hello"})
+    assert response.json()["metadata"]["count"] == 1
+
+
+def test_delete_chat(file_session, async_client):
+    _login(file_session, async_client, "chatty")
+    _chat(file_session)
+    file_session.add(DBMessage(text="hello", account_id=1, chat_id=1))
+    file_session.commit()
+
+    response = async_client.delete("/chats/1")
+    assert response.status_code == 202
+    response = async_client.get(response.headers["location"])
+    assert response.json()["status"] == "queued"
+
+
+def test_export_chat_messages(file_session, async_client):
+    _login(file_session, async_client, "chatty")
+    _chat(file_session)
+    file_session.add_all(DBMessage(text=f"message {i}", account_id=1, chat_id=1) for i in range(5))
+    file_session.commit()
+
+    response = async_client.get("/chats/1/messages/export")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["text"] for line in lines] == [f"message {i}" for i in range(5)]
+
+
+def test_post_message_with_write_batching(file_session, async_client, monkeypatch):
+    monkeypatch.setattr(settings, "db_write_batching", True)
+    headers = _login(file_session, async_client, "chatty")
+    _chat(file_session)
+
+    response = async_client.post("/chats/1/messages", headers=headers, json={"text": "batched", "account_id": 1})
+    assert response.status_code == 201
+    assert response.json()["id"] == 1
+    assert async_client.get("/chats/1/messages").json()["messages"][0]["text"] == "batched"
+
+    response = async_client.post("/chats/2/messages", headers=headers, json={"text": "nowhere", "account_id": 1})
+    assert response.status_code == 404
@@ -1,5 +1,20 @@
+import gzip
+import json
+import bcrypt
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from backend.config import settings
 from backend.database.schema import DBAccount, DBChat, DBMessage, DBChatMembership
-from datetime import datetime
+from datetime import datetime, timedelta
+
+def _login(session, client, username):
+    password = f"{username}123"
+    session.add(DBAccount(username=username, email=f"{username}@email.com", hashed_password=bcrypt.hashpw(password.encode(), bcrypt.gensalt(4)).decode()))
+    session.commit()
+
+    response = client.post("/auth/token", data={"username": username, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
 
 def test_get_nonexistent_chat(session, client):
     session.add(DBChat(name="chatty", owner_id=1))
@@ -61,8 +76,8 @@ def test_get_chats(session, client):
     assert response.json() == {
         "metadata": {"count": 2},
         "chats": [
-            {"id": 1, "name": chatty, "owner_id": 1},
-            {"id": 2, "name": yappy, "owner_id": 2}
+            {"id": 1, "name": chatty, "owner_id": 1, "message_count": 0, "member_count": 0, "last_message_at": None},
+            {"id": 2, "name": yappy, "owner_id": 2, "message_count": 0, "member_count": 0, "last_message_at": None}
         ]
     }
 
@@ -105,7 +120,7 @@ def test_get_messages(session, client):
     response = client.get("/chats/1/messages")
     assert response.status_code == 200
     assert response.json() == {
-        "metadata": {"count": 2},
+        "metadata": {"count": 2, "prev_cursor": None, "next_cursor": None},
         "messages": [
             {"id": 1, "text": chatty, "account_id": 1, "chat_id": 1, "created_at": time_str},
             {"id": 2, "text": yappy, "account_id": 1, "chat_id": 1, "created_at": time_str}
@@ -140,3 +155,270 @@ def test_get_chat_accounts(session, client):
             {"id": 2, "username": yappy}
         ]
     }
+
+
+def test_get_messages_pages(session, client):
+    time = datetime.now()
+
+    session.add(DBChat(name="chatty", owner_id=1))
+    for i in range(1, 6):
+        session.add(DBMessage(id=i, text=f"message {i}", account_id=1, chat_id=1, created_at=time + timedelta(seconds=i)))
+    session.commit()
+
+    response = client.get("/chats/1/messages", params={"limit": 2})
+    assert response.status_code == 200
+    latest = response.json()
+    assert [message["id"] for message in latest["messages"]] == [4, 5]
+    assert latest["metadata"]["next_cursor"] is None
+
+    response = client.get("/chats/1/messages", params={"limit": 2, "before": latest["metadata"]["prev_cursor"]})
+    older = response.json()
+    assert [message["id"] for message in older["messages"]] == [2, 3]
+    assert older["metadata"]["next_cursor"] is not None
+
+    response = client.get("/chats/1/messages", params={"limit": 2, "before": older["metadata"]["prev_cursor"]})
+    oldest = response.json()
+    assert [message["id"] for message in oldest["messages"]] == [1]
+    assert oldest["metadata"]["prev_cursor"] is None
+
+    response = client.get("/chats/1/messages", params={"limit": 2, "after": oldest["metadata"]["next_cursor"]})
+    assert [message["id"] for message in response.json()["messages"]] == [2, 3]
+
+def test_get_messages_invalid_cursor(session, client):
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.commit()
+
+    response = client.get("/chats/1/messages", params={"before": "not-a-cursor"})
+    assert response.status_code == 422
+    assert response.json() == {"error": "invalid_cursor", "message": "Invalid pagination cursor: not-a-cursor"}
+
+def test_update_chat_owner_requires_membership(session, client):
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password="chatty123"))
+    session.add(DBAccount(username="yappy", email="yappy@email.com", hashed_password="yappy321"))
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.commit()
+
+    response = client.put("/chats/1", json={"owner_id": 2})
+    assert response.status_code == 422
+    assert response.json() == {
+        "error": "chat_membership_required",
+        "message": "Account with id=2 must be a member of chat with id=1",
+    }
+
+    session.add(DBChatMembership(account_id=2, chat_id=1))
+    session.commit()
+
+    response = client.put("/chats/1", json={"owner_id": 2})
+    assert response.status_code == 200
+    assert response.json() == {"id": 1, "name": "chatty", "owner_id": 2}
+
+def test_websocket_receives_message_events(session, client):
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.commit()
+
+    with client.websocket_connect("/chats/1/ws", headers=headers) as websocket:
+        response = client.post("/chats/1/messages", headers=headers, json={"text": "hello", "account_id": 1})
+        assert websocket.receive_json() == {"type": "message_created", "message": response.json()}
+
+        response = client.put("/chats/1/messages/1", json={"text": "hello again"})
+        assert websocket.receive_json() == {"type": "message_updated", "message": response.json()}
+
+        client.delete("/chats/1/messages/1")
+        assert websocket.receive_json() == {"type": "message_deleted", "message": {"id": 1, "chat_id": 1}}
+
+def test_websocket_requires_membership(session, client):
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="chatty", owner_id=2))
+    session.commit()
+
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect("/chats/1/ws", headers=headers):
+            pass
+    assert error.value.code == 1008
+
+def test_websocket_requires_token(session, client):
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect("/chats/1/ws"):
+            pass
+    assert error.value.code == 1008
+
+def test_get_message_changes(session, client):
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.commit()
+
+    response = client.get("/chats/1/messages/changes")
+    assert response.json() == {"metadata": {"count": 0, "cursor": 0, "has_more": False}, "changes": []}
+
+    for text in ["first", "second", "third"]:
+        client.post("/chats/1/messages", headers=headers, json={"text": text, "account_id": 1})
+    client.put("/chats/1/messages/1", json={"text": "first, edited"})
+    client.delete("/chats/1/messages/2")
+
+    response = client.get("/chats/1/messages/changes", params={"since": 0, "limit": 2})
+    page = response.json()
+    assert page["metadata"] == {"count": 2, "cursor": 4, "has_more": True}
+    assert [(change["type"], change["message_id"]) for change in page["changes"]] == [("created", 3), ("updated", 1)]
+    assert page["changes"][1]["message"]["text"] == "first, edited"
+
+    response = client.get("/chats/1/messages/changes", params={"since": page["metadata"]["cursor"]})
+    page = response.json()
+    assert page["metadata"] == {"count": 1, "cursor": 5, "has_more": False}
+    assert page["changes"] == [{"seq": 5, "type": "deleted", "message_id": 2, "message": None}]
+
+    response = client.get("/chats/1/messages/changes", params={"since": 5})
+    assert response.json() == {"metadata": {"count": 0, "cursor": 5, "has_more": False}, "changes": []}
+
+def test_get_messages_with_authors(session, client):
+    time = datetime.now()
+
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password="chatty123"))
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBMessage(id=1, text="hello", account_id=1, chat_id=1, created_at=time))
+    session.add(DBMessage(id=2, text="bye", account_id=None, chat_id=1, created_at=time))
+    session.commit()
+
+    response = client.get("/chats/1/messages", params={"expand": "authors"})
+    assert response.status_code == 200
+    assert [(message["id"], message["username"]) for message in response.json()["messages"]] == [(1, "chatty"), (2, None)]
+
+def test_search_chat_messages(session, client):
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChat(name="yappy", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=2))
+    session.commit()
+
+    for chat_id, text in [(1, "the pony express rides at dawn"), (1, "no horses here"), (2, "ponies everywhere")]:
+        client.post(f"/chats/{chat_id}/messages", headers=headers, json={"text": text, "account_id": 1})
+    client.put("/chats/1/messages/2", json={"text": "a pony after all"})
+
+    response = client.get("/chats/1/messages/search", params={"q": "pony"})
+    assert response.status_code == 200
+    results = response.json()
+    assert results["metadata"] == {"count": 2, "offset": 0, "has_more": False}
+    assert sorted(message["id"] for message in results["messages"]) == [1, 2]
+    assert "<mark>pony</mark>" in results["messages"][0]["snippet"]
+
+    response = client.get("/chats/search", headers=headers, params={"q": "pon", "limit": 2})
+    results = response.json()
+    assert results["metadata"] == {"count": 2, "offset": 0, "has_more": True}
+
+    client.delete("/chats/1/messages/1")
+    response = client.get("/chats/1/messages/search", params={"q": "dawn"})
+    assert response.json()["messages"] == []
+
+def test_search_requires_words(session, client):
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.commit()
+
+    response = client.get("/chats/1/messages/search", params={"q": "  "})
+    assert response.status_code == 422
+    assert response.json()["error"] == "invalid_query_parameter"
+
+def test_post_message_with_write_batching(session, client, monkeypatch):
+    monkeypatch.setattr(settings, "db_write_batching", True)
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.commit()
+
+    response = client.post("/chats/1/messages", headers=headers, json={"text": "batched", "account_id": 1})
+    assert response.status_code == 201
+    assert response.json()["id"] == 1
+    assert client.get("/chats/1/messages").json()["messages"][0]["text"] == "batched"
+
+    response = client.post("/chats/2/messages", headers=headers, json={"text": "nowhere", "account_id": 1})
+    assert response.status_code == 404
+
+def test_post_messages_bulk(session, client):
+    headers = _login(session, client, "chatty")
+    session.add(DBAccount(username="yappy", email="yappy@email.com", hashed_password="yappy321"))
+    session.add(DBAccount(username="loner", email="loner@email.com", hashed_password="loner321"))
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.add(DBChatMembership(account_id=2, chat_id=1))
+    session.commit()
+
+    response = client.post("/chats/1/messages/bulk", headers=headers, json=[
+        {"text": "mine", "account_id": 1},
+        {"text": "on behalf of a member", "account_id": 2},
+        {"text": "not a member", "account_id": 3},
+        {"account_id": 1},
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert body["metadata"] == {"count": 4, "created": 2, "failed": 2}
+    assert [result["status"] for result in body["results"]] == [201, 201, 422, 422]
+    assert body["results"][1]["message"]["id"] == 2
+    assert body["results"][2]["error"] == "chat_membership_required"
+    assert body["results"][3]["error"] == "invalid_message"
+
+    ndjson = '{"text": "line one", "account_id": 1}\n\nnot json\n{"text": "line two", "account_id": 1}'
+    response = client.post("/chats/1/messages/bulk", headers={**headers, "Content-Type": "application/x-ndjson"}, content=ndjson)
+    body = response.json()
+    assert [result["status"] for result in body["results"]] == [201, 422, 201]
+    assert [result["message"]["id"] for result in body["results"] if result["status"] == 201] == [3, 4]
+
+    chat = client.get("/chats").json()["chats"][0]
+    assert chat["message_count"] == 4
+    response = client.get("/chats/1/messages/search", params={"q": "line"})
+    assert response.json()["metadata"]["count"] == 2
+
+def test_post_messages_bulk_rejects_non_arrays(session, client):
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.commit()
+
+    response = client.post("/chats/1/messages/bulk", headers=headers, json={"text": "hi", "account_id": 1})
+    assert response.status_code == 422
+    assert response.json()["error"] == "invalid_request_body"
+
+def test_export_chat_messages(session, client):
+    session.add(DBChat(name="chatty", owner_id=1))
+    for i in range(5):
+        session.add(DBMessage(text=f"message {i}", account_id=1, chat_id=1, created_at=datetime(2025, 1, 1) + timedelta(minutes=i)))
+    session.commit()
+
+    response = client.get("/chats/1/messages/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["text"] for line in lines] == [f"message {i}" for i in range(5)]
+    assert lines[0]["created_at"] == "2025-01-01T00:00:00"
+
+    response = client.get("/chats/1/messages/export", params={"after": lines[2]["cursor"], "gzip": True})
+    assert response.headers["content-disposition"] == 'attachment; filename="chat-1.ndjson.gz"'
+    resumed = [json.loads(line) for line in gzip.decompress(response.content).splitlines()]
+    assert [line["id"] for line in resumed] == [4, 5]
+
+    assert client.get("/chats/2/messages/export").status_code == 404
+
+def test_message_writes_query_budget(session, client, query_budget, monkeypatch):
+    monkeypatch.setattr(settings, "db_query_stats", True)
+    # as the application's sessions, so that commits do not force reloads
+    session.expire_on_commit = False
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.add_all(DBMessage(text=f"message {i}", account_id=1, chat_id=1) for i in range(20))
+    session.commit()
+    # the first request with a token loads its account; later ones use the token cache
+    client.get("/accounts/me", headers=headers)
+
+    # membership, insert, change log entry, counters
+    with query_budget(4):
+        response = client.post("/chats/1/messages", headers=headers, json={"text": "hello", "account_id": 1})
+    assert response.status_code == 201
+    assert "db;dur=" in response.headers["server-timing"]
+
+    # message, update, change log entry
+    with query_budget(3):
+        response = client.put("/chats/1/messages/3", json={"text": "edited"})
+    assert response.status_code == 200
+    assert response.json()["text"] == "edited"
@@ -0,0 +1,68 @@
+import bcrypt
+from sqlmodel import select
+
+from backend import jobs
+from backend.database.schema import DBAccount, DBChat, DBChatMembership, DBMessage
+
+
+def _login(session, client, username):
+    password = f"{username}123"
+    session.add(DBAccount(username=username, email=f"{username}@email.com", hashed_password=bcrypt.hashpw(password.encode(), bcrypt.gensalt(4)).decode()))
+    session.commit()
+
+    response = client.post("/auth/token", data={"username": username, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_delete_chat_runs_as_job(session, client):
+    session.add(DBAccount(username="chatty", email="chatty@email.com", hashed_password="chatty123"))
+    session.add(DBChat(name="chatty", owner_id=1, message_count=3))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    for text in ["one", "two", "three"]:
+        session.add(DBMessage(text=text, account_id=1, chat_id=1))
+    session.commit()
+
+    response = client.delete("/chats/1")
+    assert response.status_code == 202
+    assert response.headers["location"] == "/jobs/1"
+    job = response.json()
+    assert (job["kind"], job["status"], job["progress"], job["total"]) == ("delete_chat", "queued", 0, 3)
+    assert client.get("/chats/1").status_code == 200
+
+    assert jobs._run_next(session.get_bind())
+    assert not jobs._run_next(session.get_bind())
+
+    job = client.get("/jobs/1").json()
+    assert (job["status"], job["progress"], job["error"]) == ("succeeded", 3, None)
+    assert job["finished_at"] is not None
+    assert client.get("/chats/1").status_code == 404
+    assert session.exec(select(DBMessage)).all() == []
+
+def test_delete_missing_chat_is_not_queued(session, client):
+    response = client.delete("/chats/1")
+    assert response.status_code == 404
+    assert client.get("/jobs/1").status_code == 404
+
+def test_delete_account_runs_as_job(session, client):
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="yappy", owner_id=2))
+    session.add(DBChatMembership(account_id=1, chat_id=1))
+    session.add(DBMessage(text="hi", account_id=1, chat_id=1))
+    session.commit()
+
+    response = client.delete("/accounts/me", headers=headers)
+    assert response.status_code == 202
+    assert response.json()["total"] == 1
+
+    assert jobs._run_next(session.get_bind())
+    assert client.get("/jobs/1").json()["status"] == "succeeded"
+    assert client.get("/accounts/1").status_code == 404
+    assert session.exec(select(DBMessage.account_id)).all() == [None]
+
+def test_delete_chat_owner_account_is_refused(session, client):
+    headers = _login(session, client, "chatty")
+    session.add(DBChat(name="chatty", owner_id=1))
+    session.commit()
+
+    response = client.delete("/accounts/me", headers=headers)
+    assert response.status_code == 422
+    assert client.get("/jobs/1").status_code == 404
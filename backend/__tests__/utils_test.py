@@ -0,0 +1,24 @@
+import threading
+
+import pytest
+
+from backend import utils
+from backend.exceptions import ServiceUnavailable
+
+
+def test_hash_and_verify_password(monkeypatch):
+    monkeypatch.setattr(utils.settings, "bcrypt_rounds", 4)
+
+    hashed_password = utils._hash_password("password123")
+    assert hashed_password.startswith("$2b$04$")
+    assert utils._verify_password("password123", hashed_password)
+    assert not utils._verify_password("password321", hashed_password)
+
+def test_password_queue_full(monkeypatch):
+    monkeypatch.setattr(utils, "_password_slots", threading.BoundedSemaphore(1))
+    utils._password_slots.acquire()
+
+    with pytest.raises(ServiceUnavailable) as error:
+        utils._hash_password("password123")
+    assert error.value.status_code == 503
+    assert error.value.response().headers["Retry-After"] == "1"
@@ -0,0 +1,161 @@
+"""Group commit for posted messages.
+
+With `settings.db_write_batching` enabled, `POST /chats/{chat_id}/messages`
+hands its message to a single writer thread instead of committing on its own.
+The writer collects messages for up to `settings.db_write_batch_delay` seconds
+or `settings.db_write_batch_size` messages, inserts them in one transaction and
+commits once, so a burst of posts pays for one fsync instead of one each.
+Callers wait for the commit and get their message back with its id and
+`created_at`, exactly as from `backend.database.chats.add_message`.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.config import settings
+from backend.database import chats as db_chats
+from backend.database.schema import DBMessage
+from backend.dependencies import sync_bind
+from backend.exceptions import CustomHTTPException
+from backend.models.chats import MessageCreate
+
+logger = logging.getLogger(__name__)
+
+# queued to make the writer flush what it has and exit
+_STOP = object()
+
+
+class _PendingMessage(NamedTuple):
+    bind: Engine
+    chat_id: int
+    message: MessageCreate
+    account_id: int
+    future: Future
+
+
+class MessageBatcher:
+    """A writer thread inserting queued messages in batched transactions."""
+
+    def __init__(self, batch_size: int, delay: float):
+        self.batch_size = batch_size
+        self.delay = delay
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, bind: Engine, chat_id: int, message: MessageCreate, account_id: int) -> Future:
+        """Queue a message, starting the writer thread if needed.
+
+        Args:
+            bind (Engine): The engine to write with
+            chat_id (int): The id of the chat
+            message (MessageCreate): The message to add
+            account_id (int): The id of the account posting the message
+
+        Returns:
+            Future: Resolves to the committed DBMessage, or to the exception
+                `add_message` would have raised
+        """
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="message-batcher", daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put(_PendingMessage(bind, chat_id, message, account_id, future))
+        return future
+
+    async def add_message(
+        self,
+        session: Session | AsyncSession,
+        chat_id: int,
+        message: MessageCreate,
+        account_id: int,
+    ) -> DBMessage:
+        """Add a message to a chat through the writer, waiting for its commit.
+
+        Args:
+            session (Session | AsyncSession): The request's session; the message
+                is written with the sync engine on its database (see `sync_bind`)
+            chat_id (int): The id of the chat
+            message (MessageCreate): The message to add
+            account_id (int): The id of the account posting the message
+
+        Returns:
+            DBMessage: The created message
+        """
+
+        return await asyncio.wrap_future(self.submit(sync_bind(session), chat_id, message, account_id))
+
+    def close(self):
+        """Write the queued messages and stop the writer thread."""
+
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.delay
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            by_bind: dict[Engine, list[_PendingMessage]] = {}
+            for pending in batch:
+                by_bind.setdefault(pending.bind, []).append(pending)
+            for bind, pending in by_bind.items():
+                self._write(bind, pending)
+
+    def _write(self, bind: Engine, batch: list[_PendingMessage]):
+        written = []
+        try:
+            with Session(bind, expire_on_commit=False) as session:
+                for pending in batch:
+                    try:
+                        message = db_chats.insert_message(session, pending.chat_id, pending.message, pending.account_id)
+                    except CustomHTTPException as exception:
+                        # rejected before writing anything, the batch goes on
+                        pending.future.set_exception(exception)
+                    else:
+                        written.append((pending, message))
+                session.commit()
+        except Exception as exception:
+            remaining = [pending for pending in batch if not pending.future.done()]
+            if len(batch) == 1:
+                for pending in remaining:
+                    pending.future.set_exception(exception)
+                return
+            # one bad message must not fail the others: retry them one by one
+            logger.warning("batched message insert failed, retrying individually", exc_info=True)
+            for pending in remaining:
+                self._write(bind, [pending])
+            return
+
+        for pending, message in written:
+            pending.future.set_result(message)
+
+
+message_batcher = MessageBatcher(settings.db_write_batch_size, settings.db_write_batch_delay)
@@ -0,0 +1,293 @@
+"""Benchmarks of the API hot paths.
+
+Requests go through the real application with Starlette's `TestClient`, as in the
+functional tests, against an in-memory SQLite database (`StaticPool`) or a
+SQLite file, which includes the cost of syncing to disk. Datasets are built with
+`backend.database.generate`, so runs are reproducible for a given `--seed`.
+Handlers get sync sessions, or async ones with `--mode async` (as with
+`DB_ASYNC=true`), which needs the file database.
+
+Each benchmark reports latency percentiles and throughput. Results are written as
+JSON; given a baseline from an earlier run, the process exits with status 1 if
+any benchmark's median latency regressed by more than `--threshold`:
+
+    python -m backend.benchmarks --output baseline.json
+    python -m backend.benchmarks --baseline baseline.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from sqlalchemy import Engine
+from sqlmodel import Session, SQLModel, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.testclient import TestClient
+
+from backend import app, dependencies, jobs
+from backend.config import Settings, settings
+from backend.database.engine import create_async_engine_from_settings, create_engine_from_settings
+from backend.database.generate import PASSWORD, generate
+from backend.database.schema import DBChat
+from backend.database.token_cache import token_cache
+from backend.dependencies import get_db_session, get_session
+
+DEFAULT_CHAT_SIZES = (100, 10_000)
+
+
+def summarize(timings: list[float], elapsed: float) -> dict[str, float]:
+    """Latency percentiles in milliseconds, and throughput in requests per second.
+
+    Args:
+        timings (list[float]): The duration of each request in seconds
+        elapsed (float): The total time spent in requests, in seconds
+    """
+
+    ordered = sorted(timings)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, round(p * (len(ordered) - 1)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1000,
+        "throughput_rps": len(ordered) / elapsed if elapsed else 0.0,
+    }
+
+
+def measure(
+    run: Callable[[int], None],
+    iterations: int,
+    warmup: int = 0,
+    setup: Callable[[int], None] | None = None,
+) -> dict[str, float]:
+    """Time `run` over a number of iterations.
+
+    Args:
+        run (Callable[[int], None]): Issues one request, given the iteration number
+        iterations (int): The number of timed iterations
+        warmup (int): The number of untimed iterations before them
+        setup (Callable[[int], None] | None): Untimed preparation before each
+            iteration, such as creating the chat a delete will remove
+    """
+
+    for i in range(warmup):
+        if setup:
+            setup(i)
+        run(i)
+    timings = []
+    elapsed = 0.0
+    for i in range(warmup, warmup + iterations):
+        if setup:
+            setup(i)
+        started = time.perf_counter()
+        run(i)
+        timings.append(time.perf_counter() - started)
+        elapsed += timings[-1]
+    return summarize(timings, elapsed)
+
+
+def compare(results: dict, baseline: dict, threshold: float, metric: str = "p50_ms") -> list[str]:
+    """Benchmarks that got slower than the baseline by more than the threshold.
+
+    Args:
+        results (dict): The output of `run_benchmarks`
+        baseline (dict): An earlier output of `run_benchmarks`
+        threshold (float): The tolerated relative slowdown, 0.2 for 20%
+        metric (str): The latency compared
+
+    Returns:
+        list[str]: A description of each regression
+    """
+
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if before is None or not before[metric]:
+            continue
+        change = result[metric] / before[metric] - 1
+        if change > threshold:
+            regressions.append(f"{name}: {metric} {before[metric]:.2f} -> {result[metric]:.2f} ({change:+.0%})")
+    return regressions
+
+
+def _settings(database: str, directory: str) -> Settings:
+    if database == "memory":
+        url = "sqlite://"
+    else:
+        url = f"sqlite:///{Path(directory) / 'benchmarks.db'}"
+    return settings.model_copy(update={"db_url": url})
+
+
+def run_benchmarks(
+    database: str = "memory",
+    iterations: int = 200,
+    warmup: int = 10,
+    chat_sizes: tuple[int, ...] = DEFAULT_CHAT_SIZES,
+    seed: int = 0,
+    mode: str = "sync",
+) -> dict:
+    """Build a dataset and run every benchmark against it.
+
+    Args:
+        database (str): "memory" for in-memory SQLite, "file" for a SQLite file
+        iterations (int): The number of timed requests per benchmark
+        warmup (int): The number of untimed requests per benchmark
+        chat_sizes (tuple[int, ...]): Chat sizes, in messages, to list messages of
+        seed (int): Seed of the dataset generator
+        mode (str): "sync" or "async", the sessions handlers get
+
+    Returns:
+        dict: The environment of the run and the results of each benchmark
+
+    Raises:
+        ValueError: If async mode is asked for on an in-memory database, which
+            the async engine cannot share with the sync one
+    """
+
+    if mode == "async" and database == "memory":
+        raise ValueError("async mode needs a file database")
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_settings = _settings(database, directory)
+        engine = create_engine_from_settings(database_settings)
+        async_engine = create_async_engine_from_settings(database_settings) if mode == "async" else None
+        SQLModel.metadata.create_all(engine)
+
+        def _get_session_override():
+            with Session(engine, expire_on_commit=False) as session:
+                yield session
+
+        async def _get_async_session_override():
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                yield session
+
+        app.dependency_overrides[get_session] = _get_session_override
+        app.dependency_overrides[get_db_session] = _get_async_session_override if async_engine else _get_session_override
+        # batched writes and exports run on the module's sync engine
+        app_engine, dependencies.engine = dependencies.engine, engine
+        try:
+            with Session(engine) as session:
+                # one chat per size, each with its own members, all sharing PASSWORD
+                for size in chat_sizes:
+                    generate(session, accounts=10, chats=1, members_per_chat=10, messages_per_chat=size, skew=0, seed=seed)
+            client = TestClient(app)
+            benchmarks = _run(client, engine, iterations, warmup, chat_sizes)
+        finally:
+            app.dependency_overrides.pop(get_session, None)
+            app.dependency_overrides.pop(get_db_session, None)
+            dependencies.engine = app_engine
+            token_cache.clear()
+            engine.dispose()
+            if async_engine is not None:
+                asyncio.run(async_engine.dispose())
+
+    return {
+        "environment": {
+            "created_at": datetime.now().isoformat(),
+            "database": database,
+            "mode": mode,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "iterations": iterations,
+            "chat_sizes": list(chat_sizes),
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def _run(client: TestClient, engine: Engine, iterations: int, warmup: int, chat_sizes: tuple[int, ...]) -> dict:
+    # requests act as the owner of the first chat, one of its generated members
+    with Session(engine) as session:
+        owner_id = session.get(DBChat, 1).owner_id
+    username = f"user{owner_id}"
+
+    def login(i: int):
+        response = client.post("/auth/token", data={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+
+    response = client.post("/auth/token", data={"username": username, "password": PASSWORD})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    results = {"login": measure(login, iterations, warmup)}
+
+    def post_message(i: int):
+        response = client.post("/chats/1/messages", headers=headers, json={"text": f"benchmark {i}", "account_id": owner_id})
+        response.raise_for_status()
+
+    results["post_message"] = measure(post_message, iterations, warmup)
+
+    for chat_id, size in enumerate(chat_sizes, start=1):
+        def list_messages(i: int, chat_id=chat_id):
+            client.get(f"/chats/{chat_id}/messages", params={"limit": 50}).raise_for_status()
+
+        results[f"list_messages_{size}"] = measure(list_messages, iterations, warmup)
+
+    def list_members(i: int):
+        client.get("/chats/1/accounts").raise_for_status()
+
+    results["list_members"] = measure(list_members, iterations, warmup)
+
+    # each iteration deletes a fresh chat of the smallest size, through the job
+    # queue as the API does, until the job has finished
+    chats = []
+
+    def new_chat(i: int):
+        with Session(engine) as session:
+            generate(session, accounts=1, chats=1, members_per_chat=1, messages_per_chat=chat_sizes[0], skew=0)
+            chats.append(session.exec(select(func.max(DBChat.id))).one())
+
+    def delete_chat(i: int):
+        client.delete(f"/chats/{chats[-1]}").raise_for_status()
+        while jobs._run_next(engine):
+            pass
+
+    delete_iterations = max(1, iterations // 10)
+    results["delete_chat"] = measure(delete_chat, delete_iterations, min(warmup, 1), setup=new_chat)
+    return results
+
+
+def _print(results: dict):
+    print(f"{'benchmark':<24}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for name, result in results["benchmarks"].items():
+        print(f"{name:<24}{result['p50_ms']:>10.2f}{result['p90_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['throughput_rps']:>10.0f}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database", choices=["memory", "file"], default="memory")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync", help="async needs --database file")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--chat-sizes", type=int, nargs="+", default=list(DEFAULT_CHAT_SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare against results from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tolerated median slowdown, 0.2 for 20%%")
+    args = parser.parse_args()
+    if args.mode == "async" and args.database == "memory":
+        parser.error("--mode async needs --database file")
+
+    results = run_benchmarks(args.database, args.iterations, args.warmup, tuple(args.chat_sizes), args.seed, args.mode)
+    _print(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        sys.exit(1 if regressions else 0)
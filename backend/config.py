@@ -6,12 +6,49 @@ class Settings(BaseSettings):
     app_title: str = "pony express"
     app_description: str = "A social messaging app"
     db_url: str = "sqlite:///backend/database/development.db"
-    db_sqlite: bool = True
+    db_sqlite: bool | None = None
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    db_async: bool = False
+    db_sqlite_profile: str = "default"
+    db_sqlite_pragmas: dict[str, str | int] = {}
+    db_check_query_plans: bool = True
+    db_bulk_chunk_size: int = 5000
+    db_write_batching: bool = False
+    db_write_batch_size: int = 100
+    db_write_batch_delay: float = 0.005
+    db_query_stats: bool = False
+    db_repeated_query_threshold: int = 10
+    db_slow_query_threshold: float | None = 0.1
+    db_slow_query_log: str | None = None
+    db_slow_query_log_max_bytes: int = 10_000_000
+    db_slow_query_log_backups: int = 5
+    metrics_enabled: bool = True
+    jobs_workers: int = 1
+    jobs_poll_interval: float = 5
+    jobs_throttle: float = 0
+    jobs_stale_after: float = 300
     jwt_algorithm: str = "HS256"
     jwt_cookie_key: str = "pony-express-token"
     jwt_duration: int = 3600
     jwt_issuer: str = "http://127.0.0.1"
     jwt_secret_key: str = "super-secret-key"
+    token_cache_size: int = 4096
+    bcrypt_rounds: int = 12
+    password_workers: int = 2
+    password_queue_depth: int = 16
+    accounts_batch_max: int = 500
+    messages_page_size: int = 50
+    messages_page_size_max: int = 500
+    messages_bulk_max: int = 10000
+    messages_export_batch_size: int = 1000
+    search_page_size: int = 20
+    search_page_size_max: int = 100
+    ws_send_queue_size: int = 256
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
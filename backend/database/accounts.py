@@ -1,24 +1,58 @@
+from typing import Callable
+
+from sqlalchemy import Row, delete, update
 from sqlmodel import Session, select
 
-from backend.database.schema import DBAccount, DBChat
+from backend.database import bulk as db_bulk
+from backend.database import changes as db_changes
+from backend.database import counters as db_counters
+from backend.database.schema import DBAccount, DBChat, DBChatMembership, DBMessage
+from backend.database.token_cache import token_cache
 from backend.exceptions import ChatOwnerRemoval, DuplicateEntityValue, EntityNotFound, InvalidCredentials
 from backend.models.accounts import AccountUpdate
 from backend.utils import _hash_password, _verify_password
 
-def get_all(session: Session) -> list[DBAccount]:
+# Statement builders for the hot queries, shared with `backend.database.plans`.
+
+def account_by_username_query(username: str):
+    return select(DBAccount).where(DBAccount.username == username)
+
+def account_by_email_query(email: str):
+    return select(DBAccount).where(DBAccount.email == email)
+
+def accounts_by_ids_query(account_ids: list[int]):
+    return select(DBAccount.id, DBAccount.username).where(DBAccount.id.in_(set(account_ids))).order_by(DBAccount.id)
+
+def owned_chats_query(account_id: int):
+    return select(DBChat).where(DBChat.owner_id == account_id)
+
+def get_all(session: Session) -> list[Row]:
     """Retrieve all accounts from database.
     
     Args:
         session (Session): The database session
     
     Returns:
-        list[DBAccount]: The list of accounts
+        list[Row]: Rows with the id and username of each account
     """
 
-    stmt = select(DBAccount)
+    stmt = select(DBAccount.id, DBAccount.username)
     results = session.exec(stmt)
     return list(results)
 
+def get_by_ids(session: Session, account_ids: list[int]) -> list[Row]:
+    """Retrieve several accounts from database in one query.
+    
+    Args:
+        session (Session): The database session
+        account_ids (list[int]): The ids of the accounts to retrieve
+    
+    Returns:
+        list[Row]: The id and username of the accounts that exist, ordered by id
+    """
+
+    return list(session.exec(accounts_by_ids_query(account_ids)))
+
 def get_by_id(session: Session, account_id: int) -> DBAccount:
     """Retrieve specific account from database.
     
@@ -56,14 +90,14 @@ def update_account(session: Session, account_id: int, updated_account: AccountUp
         return account
     
     if updated_account.username is not None:
-        existing_username = session.exec(select(DBAccount).where(DBAccount.username == updated_account.username)).first()
+        existing_username = session.exec(account_by_username_query(updated_account.username)).first()
         if existing_username and existing_username.id != account_id:
             raise DuplicateEntityValue("username", updated_account.username)
         
         if account.username != updated_account.username:
             setattr(account, "username", updated_account.username)
     if updated_account.email is not None:
-        existing_email = session.exec(select(DBAccount).where(DBAccount.email == updated_account.email)).first()
+        existing_email = session.exec(account_by_email_query(updated_account.email)).first()
         if existing_email and existing_email.id != account_id:
             raise DuplicateEntityValue("email", updated_account.email)
         
@@ -72,6 +106,7 @@ def update_account(session: Session, account_id: int, updated_account: AccountUp
 
     session.commit()
     session.refresh(account)
+    token_cache.invalidate_account(account_id)
 
     return account
 
@@ -87,25 +122,55 @@ def update_password(session: Session, account: DBAccount, old_password: str, new
         InvalidCredentials: If the old password is incorrect
     """
     
+    # the account may be a cached snapshot, so work on the stored row
+    account = get_by_id(session, account.id)
     if not _verify_password(old_password, account.hashed_password):
         raise InvalidCredentials()
     
     account.hashed_password = _hash_password(new_password)
     session.commit()
     session.refresh(account)
+    token_cache.invalidate_account(account.id)
 
-def delete_account(session: Session, account_id: int):
+def delete_account(session: Session, account_id: int, on_chunk: Callable[[int], None] | None = None):
     """Delete an account from the database.
+
+    Its messages stay in their chats without an author. Like
+    `backend.database.chats.delete_membership`, they are updated with bulk
+    statements in chunks, and the account goes in the final transaction.
     
     Args:
         session (Session): The database session
         account_id (int): The id of the account to delete
+        on_chunk (Callable[[int], None] | None): Called with the number of
+            messages updated by each chunk
+
+    Raises:
+        EntityNotFound: If no account with given id exists
+        ChatOwnerRemoval: If the account still owns chats
     """
     
     account = get_by_id(session, account_id)
-    owned_chats = session.exec(select(DBChat).where(DBChat.owner_id == account.id)).all()
+    owned_chats = session.exec(owned_chats_query(account.id)).all()
     if len(owned_chats) > 0:
         raise ChatOwnerRemoval()
+    # deleted with a statement below, so keep the ORM from cascading over
+    # account.messages and account.memberships row by row
+    session.expunge(account)
+
+    def clear_author(session: Session, message_ids):
+        db_changes.record_author_removed(session, account_id, message_ids=message_ids)
+        session.execute(
+            update(DBMessage).where(DBMessage.id.in_(message_ids)).values(account_id=None),
+            execution_options={"synchronize_session": "fetch"},
+        )
 
-    session.delete(account)
+    db_bulk.in_chunks(session, select(DBMessage.id).where(DBMessage.account_id == account_id), clear_author, on_chunk=on_chunk)
+    db_counters.account_removed(session, account_id)
+    session.execute(
+        delete(DBChatMembership).where(DBChatMembership.account_id == account_id),
+        execution_options={"synchronize_session": "fetch"},
+    )
+    session.execute(delete(DBAccount).where(DBAccount.id == account_id))
     session.commit()
+    token_cache.invalidate_account(account_id)
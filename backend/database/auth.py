@@ -1,24 +1,23 @@
 import datetime
 import jwt
-import os
 
-from dotenv import load_dotenv
-
-from sqlmodel import Session, select
+from sqlmodel import Session
 
 from backend.models.auth import AccessToken, Claims, Login, Registration
 from backend.exceptions import DuplicateEntityValue, EntityNotFound, Forbidden, InvalidCredentials
 from backend.utils import _hash_password, _verify_password  
 from backend.database.schema import DBAccount
+from backend.database.accounts import account_by_email_query, account_by_username_query
+from backend.database.token_cache import token_cache
 from backend.config import settings
 
 
-load_dotenv()
-JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-JWT_COOKIE_KEY = os.getenv("JWT_COOKIE_KEY")
-JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
-JWT_ISSUER = os.getenv("JWT_ISSUER")
-DURATION = os.getenv("JWT_DURATION", 3600)  # Default to 1 hour if not set
+# settings reads the same JWT_* variables from the environment and .env, with defaults
+JWT_SECRET_KEY = settings.jwt_secret_key
+JWT_COOKIE_KEY = settings.jwt_cookie_key
+JWT_ALGORITHM = settings.jwt_algorithm
+JWT_ISSUER = settings.jwt_issuer
+DURATION = settings.jwt_duration
 
 
 def create_user(session: Session, form: Registration) -> DBAccount:
@@ -32,11 +31,11 @@ def create_user(session: Session, form: Registration) -> DBAccount:
         DBUser: The newly created user
     """
 
-    existing_user = session.exec(select(DBAccount).where(DBAccount.username == form.username)).first()
+    existing_user = session.exec(account_by_username_query(form.username)).first()
     if existing_user:
         raise DuplicateEntityValue("username", form.username)
     
-    existing_email = session.exec(select(DBAccount).where(DBAccount.email == form.email)).first()
+    existing_email = session.exec(account_by_email_query(form.email)).first()
     if existing_email:
         raise DuplicateEntityValue("email", form.email)
 
@@ -58,7 +57,7 @@ def generate_token(session: Session, form: Login) -> str:
         str: The access token
     """
 
-    account = session.exec(select(DBAccount).where(DBAccount.username == form.username)).first()
+    account = session.exec(account_by_username_query(form.username)).first()
     
     account = validate_credentials(account, form.password)
     if account is None:
@@ -102,9 +101,25 @@ def get_access_token(session: Session, form: Login) -> AccessToken:
     access_token = generate_token(session, form)
     return AccessToken(access_token=access_token, token_type="bearer")
 
+def get_cached_account(token: str) -> DBAccount | None:
+    """Look up the account of an already verified, unexpired token.
+
+    Args:
+        token (str): The access token (JWT)
+
+    Returns:
+        DBAccount | None: A snapshot of the account, if the token is cached
+    """
+
+    cached = token_cache.get(token) if token else None
+    return cached.account() if cached is not None else None
+
 def extract_account(session: Session, token: str) -> DBAccount:
     """Extract an account from a JWT.
 
+    Verified tokens are cached until they expire, so repeat callers are
+    answered from an account snapshot without decoding or querying.
+
     Args:
         session (Session): The database session
         token (str): The access token (JWT)
@@ -120,14 +135,20 @@ def extract_account(session: Session, token: str) -> DBAccount:
 
     if not token:
         raise Forbidden("authentication_required", "Not authenticated")
+    account = get_cached_account(token)
+    if account is not None:
+        return account
     try:
-        claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        claims = Claims(**jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM]))
     except jwt.ExpiredSignatureError:
         raise Forbidden("expired_access_token", "Authentication failed: expired access token")
-    except jwt.InvalidTokenError:
+    except (jwt.InvalidTokenError, ValueError):
         raise Forbidden("invalid_access_token", "Authentication failed: invalid access token")
-    account_id = int(claims['sub'])  
-    account = session.get(DBAccount, account_id)
+    # read first, so a concurrent update or deletion keeps the loaded
+    # snapshot out of the cache
+    generation = token_cache.generation(int(claims.sub))
+    account = session.get(DBAccount, int(claims.sub))
     if account is None:
         raise InvalidCredentials()
+    token_cache.put(token, claims, account, generation)
     return account
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""Set-based writes over many rows.
+
+Cascades such as deleting a chat touch every message it holds. Rather than
+loading those rows into the session, they are changed with bulk statements; with
+`settings.db_bulk_chunk_size` set, a chunk of rows at a time, each in its own
+transaction, so a huge cascade does not hold the write lock for its whole
+duration and concurrent writers get a turn between chunks.
+
+Loads, such as seeding, work the same way in the other direction: rows are
+inserted with executemany, a chunk per transaction, from an iterator that is
+never materialized.
+"""
+
+from itertools import islice
+from typing import Any, Callable, Iterable
+
+from sqlalchemy import Insert, Table, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.sql import Select
+from sqlmodel import Session
+
+from backend.config import settings
+
+
+def in_chunks(
+    session: Session,
+    ids: Select,
+    apply: Callable[[Session, Any], None],
+    chunk_size: int | None = None,
+    on_chunk: Callable[[int], None] | None = None,
+):
+    """Apply bulk statements to the rows selected by `ids`.
+
+    Chunks are committed as they go. The final call covers the whole selection,
+    picking up rows that appeared meanwhile, and is left uncommitted so the
+    caller can finish the cascade in the same transaction. Every chunk must
+    take its rows out of the selection, by deleting them or changing a column
+    the selection filters on.
+
+    Args:
+        session (Session): The database session
+        ids (Select): A select of the primary keys of the rows
+        apply (Callable[[Session, Any], None]): Issues the statements, restricted
+            with `.in_()` to the ids it is given: a list of ids or the select
+        chunk_size (int | None): The number of rows per transaction, defaults to
+            `settings.db_bulk_chunk_size`; 0 changes all rows in one transaction
+        on_chunk (Callable[[int], None] | None): Called with the number of rows
+            after each chunk is committed, to report progress or throttle
+    """
+
+    if chunk_size is None:
+        chunk_size = settings.db_bulk_chunk_size
+    while chunk_size:
+        chunk = list(session.scalars(ids.limit(chunk_size)))
+        if not chunk:
+            break
+        apply(session, chunk)
+        session.commit()
+        if on_chunk is not None:
+            on_chunk(len(chunk))
+        if len(chunk) < chunk_size:
+            break
+    apply(session, ids)
+
+
+def insert_ignore(session: Session, table: Table) -> Insert:
+    """An INSERT that skips rows conflicting with existing keys.
+
+    Args:
+        session (Session): The database session, whose dialect picks the syntax
+        table (Table): The table to insert into
+
+    Returns:
+        Insert: The statement, to execute with a list of rows
+    """
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+def insert_chunks(
+    session: Session,
+    stmt: Insert,
+    rows: Iterable[dict],
+    chunk_size: int | None = None,
+) -> int:
+    """Insert rows with executemany, committing a chunk at a time.
+
+    Args:
+        session (Session): The database session
+        stmt (Insert): The statement, such as `insert(table)` or `insert_ignore`
+        rows (Iterable[dict]): The rows, consumed lazily
+        chunk_size (int | None): The number of rows per transaction, defaults
+            to `settings.db_bulk_chunk_size`; 0 inserts all rows in one transaction
+
+    Returns:
+        int: The number of rows given
+    """
+
+    if chunk_size is None:
+        chunk_size = settings.db_bulk_chunk_size
+    rows = iter(rows)
+    count = 0
+    while chunk := list(islice(rows, chunk_size or None)):
+        session.execute(stmt, chunk)
+        session.commit()
+        count += len(chunk)
+    return count
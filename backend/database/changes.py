@@ -0,0 +1,131 @@
+"""Change log of chat messages, for delta sync.
+
+Every write that creates, edits or deletes a message, or changes it as a side
+effect (such as removing its author), appends a row to `message_changes` with a
+monotonic sequence number. Clients that reconnect ask for the changes after the
+last sequence number they saw, so catching up costs the size of the gap rather
+than the size of the chat.
+"""
+
+from typing import Any
+
+from sqlalchemy import func, insert, literal
+from sqlmodel import Session, select
+
+from backend.database.schema import DBMessage, DBMessageChange
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+
+def record_change(session: Session, chat_id: int, message_id: int, kind: str):
+    """Append a change to the log, as part of the caller's transaction.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        message_id (int): The id of the changed message
+        kind (str): One of `CREATED`, `UPDATED` or `DELETED`
+    """
+
+    session.add(DBMessageChange(chat_id=chat_id, message_id=message_id, kind=kind))
+
+
+def record_changes(session: Session, chat_id: int, message_ids: list[int], kind: str):
+    """Append the same change for many messages, in one executemany.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        message_ids (list[int]): The ids of the changed messages
+        kind (str): One of `CREATED`, `UPDATED` or `DELETED`
+    """
+
+    if message_ids:
+        session.execute(
+            insert(DBMessageChange),
+            [{"chat_id": chat_id, "message_id": message_id, "kind": kind} for message_id in message_ids],
+        )
+
+
+def record_author_removed(
+    session: Session,
+    account_id: int,
+    chat_id: int | None = None,
+    message_ids: Any = None,
+):
+    """Log an update for every message of an account, in one statement.
+
+    Must run before the messages' `account_id` is cleared.
+
+    Args:
+        session (Session): The database session
+        account_id (int): The id of the account being removed
+        chat_id (int | None): Only log messages in this chat
+        message_ids (Any): Only log these messages, a list of ids or a select
+    """
+
+    messages = select(DBMessage.chat_id, DBMessage.id, literal(UPDATED)).where(DBMessage.account_id == account_id)
+    if chat_id is not None:
+        messages = messages.where(DBMessage.chat_id == chat_id)
+    if message_ids is not None:
+        messages = messages.where(DBMessage.id.in_(message_ids))
+    session.execute(
+        insert(DBMessageChange).from_select(["chat_id", "message_id", "kind"], messages)
+    )
+
+
+def changes_query(chat_id: int, since: int, limit: int):
+    # the newest change of each message in the gap, oldest first
+    latest = (
+        select(DBMessageChange.message_id, func.max(DBMessageChange.seq).label("seq"))
+        .where(DBMessageChange.chat_id == chat_id, DBMessageChange.seq > since)
+        .group_by(DBMessageChange.message_id)
+        .subquery()
+    )
+    return (
+        select(DBMessageChange, DBMessage)
+        .join(latest, DBMessageChange.seq == latest.c.seq)
+        .outerjoin(DBMessage, DBMessage.id == DBMessageChange.message_id)
+        .order_by(DBMessageChange.seq)
+        .limit(limit)
+    )
+
+
+def current_seq(session: Session, chat_id: int) -> int:
+    """The sequence number of the newest change in a chat, or 0.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+    """
+
+    stmt = select(func.max(DBMessageChange.seq)).where(DBMessageChange.chat_id == chat_id)
+    return session.exec(stmt).one() or 0
+
+
+def get_changes(
+    session: Session,
+    chat_id: int,
+    since: int,
+    limit: int,
+) -> tuple[list[tuple[DBMessageChange, DBMessage | None]], bool]:
+    """Retrieve the changes to a chat's messages after a sequence number.
+
+    Each message appears once, with its newest change and current state; the
+    state is None for deleted messages.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        since (int): Only return changes with a greater sequence number
+        limit (int): The maximum number of changes
+
+    Returns:
+        tuple[list[tuple[DBMessageChange, DBMessage | None]], bool]: The changes in
+            sequence order, and whether more changes follow them
+    """
+
+    rows = list(session.exec(changes_query(chat_id, since, limit + 1)))
+    return [tuple(row) for row in rows[:limit]], len(rows) > limit
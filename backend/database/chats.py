@@ -1,21 +1,109 @@
+from datetime import datetime
+from typing import Callable, Iterator
+
+from sqlalchemy import Row, case, delete, func, insert, tuple_, update
 from sqlmodel import Session, select
 
-from backend.database.schema import DBChat, DBMessage, DBAccount, DBChatMembership
-from backend.exceptions import ChatMembershipRequired, ChatOwnerRemoval, EntityNotFound, DuplicateEntity, Forbidden
-from backend.models.chats import ChatCreate, ChatUpdate, ChatMembershipCreate, ChatMembership, MessageCreate, MessageUpdate
+from backend.database.schema import DBChat, DBMessage, DBAccount, DBChatMembership, DBMessageChange
+from backend.config import settings
+from backend.exceptions import ChatMembershipRequired, ChatOwnerRemoval, CustomHTTPException, EntityNotFound, DuplicateEntity, Forbidden
+from backend.models.chats import ChatCreate, ChatUpdate, ChatMembershipCreate, ChatMembership, MessageCreate, MessageCursor, MessageUpdate
 from backend.database import accounts as db_accounts
+from backend.database import bulk as db_bulk
+from backend.database import changes as db_changes
+from backend.database import counters as db_counters
+from backend.database import search as db_search
+
+# Statement builders for the hot queries. They are shared with the startup query
+# plan check in `backend.database.plans`, so every statement issued here is one
+# whose plan is verified against the indexes declared in the schema.
+
+def chat_by_name_query(name: str):
+    return select(DBChat).where(DBChat.name == name)
+
+# the columns list endpoints return, selected as plain rows: rows skip the ORM's
+# identity map and object construction, and serialize straight to JSON
+CHAT_COLUMNS = (DBChat.id, DBChat.name, DBChat.owner_id, DBChat.message_count, DBChat.member_count, DBChat.last_message_at)
+MESSAGE_COLUMNS = (DBMessage.id, DBMessage.text, DBMessage.account_id, DBMessage.chat_id, DBMessage.created_at)
+
+def chat_accounts_query(chat_id: int):
+    return select(DBAccount.id, DBAccount.username).join(DBChatMembership).where(DBChatMembership.chat_id == chat_id)
+
+def chat_messages_query(chat_id: int):
+    return select(DBMessage).where(DBMessage.chat_id == chat_id)
+
+def member_messages_query(chat_id: int, account_id: int):
+    return select(DBMessage).where(DBMessage.chat_id == chat_id, DBMessage.account_id == account_id)
+
+def chat_memberships_query(chat_id: int):
+    return select(DBChatMembership).where(DBChatMembership.chat_id == chat_id)
+
+def messages_page_query(
+    chat_id: int,
+    limit: int,
+    before: MessageCursor | None = None,
+    after: MessageCursor | None = None,
+    with_authors: bool = False,
+):
+    key = tuple_(DBMessage.created_at, DBMessage.id)
+    if with_authors:
+        stmt = (
+            select(*MESSAGE_COLUMNS, DBAccount.username)
+            .outerjoin(DBAccount, DBAccount.id == DBMessage.account_id)
+            .where(DBMessage.chat_id == chat_id)
+        )
+    else:
+        stmt = select(*MESSAGE_COLUMNS).where(DBMessage.chat_id == chat_id)
+    if before is not None:
+        stmt = stmt.where(key < tuple_(before.created_at, before.id))
+    if after is not None:
+        stmt = stmt.where(key > tuple_(after.created_at, after.id))
+        stmt = stmt.order_by(DBMessage.created_at, DBMessage.id)
+    else:
+        stmt = stmt.order_by(DBMessage.created_at.desc(), DBMessage.id.desc())
+    return stmt.limit(limit)
+
+def inbox_query(account_id: int):
+    # one row per membership with the number of messages by others past the
+    # read position, joined back to the chat and its latest message; the
+    # conditions are part of the join, so only unread messages are visited,
+    # found through ix_messages_chat_id_id_account_id
+    unread = (
+        (DBMessage.chat_id == DBChatMembership.chat_id)
+        & (DBMessage.id > func.coalesce(DBChatMembership.last_read_message_id, 0))
+        & DBMessage.account_id.is_distinct_from(account_id)
+    )
+    stats = (
+        select(DBChatMembership.chat_id, func.count(DBMessage.id).label("unread_count"))
+        .outerjoin(DBMessage, unread)
+        .where(DBChatMembership.account_id == account_id)
+        .group_by(DBChatMembership.chat_id)
+        .subquery()
+    )
+    return (
+        select(DBChat, DBMessage, stats.c.unread_count)
+        .join(stats, stats.c.chat_id == DBChat.id)
+        .outerjoin(DBMessage, DBMessage.id == DBChat.last_message_id)
+        .order_by(DBChat.last_message_at.desc().nulls_last(), DBChat.id.desc())
+    )
+
+def messages_export_query(chat_id: int, after: MessageCursor | None = None):
+    stmt = select(*MESSAGE_COLUMNS).where(DBMessage.chat_id == chat_id)
+    if after is not None:
+        stmt = stmt.where(tuple_(DBMessage.created_at, DBMessage.id) > tuple_(after.created_at, after.id))
+    return stmt.order_by(DBMessage.created_at, DBMessage.id)
 
-def get_all(session: Session) -> list[DBChat]:
+def get_all(session: Session) -> list[Row]:
     """Retrieve all chats from database.
     
     Args:
         session (Session): The database session
     
     Returns:
-        list[DBChat]: The list of chats
+        list[Row]: Rows with the `CHAT_COLUMNS` of each chat
     """
 
-    stmt = select(DBChat)
+    stmt = select(*CHAT_COLUMNS)
     results = session.exec(stmt)
     return list(results)
 
@@ -49,9 +137,9 @@ def get_by_name(session: Session, name: str) -> DBChat | None:
         DBChat: The chat
     """
     
-    return session.exec(select(DBChat).where(DBChat.name == name)).first()
+    return session.exec(chat_by_name_query(name)).first()
 
-def get_accounts_for_chat(session: Session, chat_id: int) -> list[DBAccount]:
+def get_accounts_for_chat(session: Session, chat_id: int) -> list[Row]:
     """Retrieve all accounts for a chat in the database.
     
     Args:
@@ -59,7 +147,7 @@ def get_accounts_for_chat(session: Session, chat_id: int) -> list[DBAccount]:
         chat_id (int): The id of the chat
     
     Returns:
-        list[DBAccount]: The list of accounts belonging to chat
+        list[Row]: Rows with the id and username of each member
 
     Raises:
         EntityNotFound: If no chat with given id exists
@@ -68,8 +156,7 @@ def get_accounts_for_chat(session: Session, chat_id: int) -> list[DBAccount]:
     chat = session.get(DBChat, chat_id)
     if chat is None:
         raise EntityNotFound("chat", chat_id)
-    stmt = select(DBAccount).join(DBChatMembership).where(DBChatMembership.chat_id == chat_id)
-    results = session.exec(stmt)
+    results = session.exec(chat_accounts_query(chat_id))
     return list(results)
 
 def get_messages_for_chat(session: Session, chat_id: int) -> list[DBMessage]:
@@ -87,10 +174,202 @@ def get_messages_for_chat(session: Session, chat_id: int) -> list[DBMessage]:
     """
     
     chat = get_by_id(session, chat_id)
-    stmt = select(DBMessage).where(DBMessage.chat_id == chat_id)
-    results = session.exec(stmt)
+    results = session.exec(chat_messages_query(chat_id))
     return list(results)
 
+def get_messages_page(
+    session: Session,
+    chat_id: int,
+    limit: int,
+    before: MessageCursor | None = None,
+    after: MessageCursor | None = None,
+) -> tuple[list[Row], bool]:
+    """Retrieve one page of messages for a chat using keyset pagination.
+
+    Messages are ordered by (created_at, id). Without an `after` cursor the page
+    is read backwards from `before` (or from the newest message), otherwise it is
+    read forwards from `after`, optionally bounded by `before`.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        limit (int): The maximum number of messages in the page
+        before (MessageCursor | None): Only return messages older than this position
+        after (MessageCursor | None): Only return messages newer than this position
+
+    Returns:
+        tuple[list[Row], bool]: The page in ascending order, as rows with the
+            `MESSAGE_COLUMNS` of each message, and whether more messages exist
+            beyond the page in the direction of travel
+
+    Raises:
+        EntityNotFound: If no chat with given id exists
+    """
+
+    chat = get_by_id(session, chat_id)
+    return _page(list(session.exec(messages_page_query(chat_id, limit + 1, before, after))), limit, after)
+
+def get_messages_page_with_authors(
+    session: Session,
+    chat_id: int,
+    limit: int,
+    before: MessageCursor | None = None,
+    after: MessageCursor | None = None,
+) -> tuple[list[Row], bool]:
+    """Retrieve one page of messages for a chat, joined with their authors' usernames.
+
+    Same as `get_messages_page`, but each row ends with the `username` of the
+    message's author, or None if the author was removed.
+
+    Raises:
+        EntityNotFound: If no chat with given id exists
+    """
+
+    chat = get_by_id(session, chat_id)
+    rows = session.exec(messages_page_query(chat_id, limit + 1, before, after, with_authors=True))
+    return _page(list(rows), limit, after)
+
+def _page(rows: list, limit: int, after: MessageCursor | None) -> tuple[list, bool]:
+    # rows were read with one extra row to detect a further page, and backwards
+    # unless reading forwards from an `after` cursor
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+    return rows, has_more
+
+def iter_messages(
+    session: Session,
+    chat_id: int,
+    after: MessageCursor | None = None,
+    batch_size: int = 1000,
+) -> Iterator[Row]:
+    """Iterate over all messages of a chat, oldest first, from a server-side cursor.
+
+    Rows are fetched `batch_size` at a time, so memory stays flat however long
+    the chat is. The session's connection is held until iteration ends.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        after (MessageCursor | None): Only messages after this position
+        batch_size (int): The number of rows fetched at a time
+
+    Returns:
+        Iterator[Row]: Rows with the id, text, account_id, chat_id and
+            created_at of each message
+    """
+
+    stmt = messages_export_query(chat_id, after).execution_options(yield_per=batch_size)
+    yield from session.exec(stmt)
+
+def get_message_changes(
+    session: Session,
+    chat_id: int,
+    since: int | None,
+    limit: int,
+) -> tuple[list[tuple[DBMessageChange, DBMessage | None]], int, bool]:
+    """Retrieve the changes to a chat's messages after a change sequence number.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        since (int | None): The last sequence number the caller has seen; when
+            None, no changes are returned, only the current sequence number
+        limit (int): The maximum number of changes
+
+    Returns:
+        tuple[list[tuple[DBMessageChange, DBMessage | None]], int, bool]: The
+            newest change of each changed message with its current state (None
+            once deleted), the sequence number to resume from, and whether more
+            changes follow
+
+    Raises:
+        EntityNotFound: If no chat with given id exists
+    """
+
+    chat = get_by_id(session, chat_id)
+    if since is None:
+        return [], db_changes.current_seq(session, chat_id), False
+
+    changes, has_more = db_changes.get_changes(session, chat_id, since, limit)
+    cursor = changes[-1][0].seq if changes else since
+    return changes, cursor, has_more
+
+def get_inbox(session: Session, account_id: int) -> list[tuple[DBChat, DBMessage | None, int]]:
+    """Retrieve the chats of an account, most recently active first.
+
+    Args:
+        session (Session): The database session
+        account_id (int): The id of the account
+
+    Returns:
+        list[tuple[DBChat, DBMessage | None, int]]: Each chat with its latest
+            message, if any, and the number of unread messages by other accounts
+    """
+
+    return [tuple(row) for row in session.exec(inbox_query(account_id))]
+
+def mark_read(session: Session, chat_id: int, account_id: int, message_id: int | None = None) -> DBChatMembership:
+    """Move the read position of a member forward.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        account_id (int): The id of the account
+        message_id (int | None): The id of the last read message, the newest
+            message of the chat if not given or past it
+
+    Returns:
+        DBChatMembership: The updated membership
+
+    Raises:
+        ChatMembershipRequired: If the account is not a member of the chat
+    """
+
+    membership = require_membership(session, chat_id, account_id)
+    newest = session.exec(
+        select(func.max(DBMessage.id)).where(DBMessage.chat_id == chat_id)
+    ).one()
+    # clamped, so an id from another chat cannot also hide messages posted
+    # here later
+    if message_id is None or newest is None or message_id > newest:
+        message_id = newest
+    # the position never moves backwards, so a stale client cannot mark read
+    # messages unread again
+    if message_id is not None and message_id > (membership.last_read_message_id or 0):
+        membership.last_read_message_id = message_id
+        session.add(membership)
+        session.commit()
+    return membership
+
+def search_chat_messages(
+    session: Session,
+    chat_id: int,
+    match: str,
+    limit: int,
+    offset: int = 0,
+) -> tuple[list[tuple[DBMessage, str]], bool]:
+    """Search the messages of a chat, best matches first.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        match (str): An FTS5 query, see `backend.database.search.match_expression`
+        limit (int): The maximum number of results
+        offset (int): The number of results to skip
+
+    Returns:
+        tuple[list[tuple[DBMessage, str]], bool]: The matching messages with a
+            highlighted snippet, and whether more results follow
+
+    Raises:
+        EntityNotFound: If no chat with given id exists
+    """
+
+    get_by_id(session, chat_id)
+    return db_search.search_messages(session, match, limit, offset, chat_id=chat_id)
+
 def create_chat(session: Session, chat: ChatCreate, account_id: int) -> DBChat:
     """Create a new chat in the database.
     
@@ -118,6 +397,7 @@ def create_chat(session: Session, chat: ChatCreate, account_id: int) -> DBChat:
     db_chat = DBChat(
         name=chat.name,
         owner_id=user.id,
+        member_count=1,
     )
 
     membership = DBChatMembership(
@@ -153,10 +433,7 @@ def update_chat(session: Session, chat_id: int, chat: ChatUpdate) -> DBChat:
     updated_chat = get_by_id(session, chat_id)
 
     if (chat.owner_id):
-        account = session.get(DBAccount, chat.owner_id)
-        accounts = get_accounts_for_chat(session, chat_id)
-        if account is None or not any(acc.id == chat.owner_id for acc in accounts):
-            raise ChatMembershipRequired(chat.owner_id, chat_id)
+        require_membership(session, chat_id, chat.owner_id)
         setattr(updated_chat, "owner_id", chat.owner_id)
 
     if (chat.name):
@@ -169,28 +446,41 @@ def update_chat(session: Session, chat_id: int, chat: ChatUpdate) -> DBChat:
     session.refresh(updated_chat)
     return updated_chat
 
-def delete_chat(session: Session, chat_id: int):
+def delete_chat(session: Session, chat_id: int, on_chunk: Callable[[int], None] | None = None):
     """Delete a chat from the database.
+
+    Its messages are deleted with bulk statements, in chunks of
+    `settings.db_bulk_chunk_size` committed one at a time; the chat itself, its
+    memberships and its change log go in the final transaction.
     
     Args:
         session (Session): The database session
         chat_id (int): The id of the chat to delete
+        on_chunk (Callable[[int], None] | None): Called with the number of
+            messages deleted by each chunk
         
     Raises:
         EntityNotFound: If no chat with given id exists
     """
     
     chat = get_by_id(session, chat_id)
-    messages = session.exec(select(DBMessage).where(DBMessage.chat_id == chat_id)).all()
-    memberships = session.exec(select(DBChatMembership).where(DBChatMembership.chat_id == chat_id)).all()
-
-    for msg in messages:
-        session.delete(msg)
-
-    for membership in memberships:
-        session.delete(membership)
-
-    session.delete(chat)
+    # deleted with a statement below, so keep the ORM from cascading over
+    # chat.messages and chat.memberships row by row
+    session.expunge(chat)
+
+    def delete_messages(session: Session, message_ids):
+        session.execute(
+            delete(DBMessage).where(DBMessage.id.in_(message_ids)),
+            execution_options={"synchronize_session": "fetch"},
+        )
+
+    db_bulk.in_chunks(session, select(DBMessage.id).where(DBMessage.chat_id == chat_id), delete_messages, on_chunk=on_chunk)
+    session.execute(
+        delete(DBChatMembership).where(DBChatMembership.chat_id == chat_id),
+        execution_options={"synchronize_session": "fetch"},
+    )
+    session.execute(delete(DBMessageChange).where(DBMessageChange.chat_id == chat_id))
+    session.execute(delete(DBChat).where(DBChat.id == chat_id))
 
     session.commit()
     
@@ -209,22 +499,115 @@ def add_message(session: Session, chat_id: int, message: MessageCreate, account_
         EntityNotFound: If no chat with given id exists
         ChatMembershipRequired: If the account is not a member of the chat or does not exist
     """
+
+    new_message = insert_message(session, chat_id, message, account_id)
+    session.commit()
+
+    return new_message
+
+def insert_message(session: Session, chat_id: int, message: MessageCreate, account_id: int) -> DBMessage:
+    """Add a message to a chat without committing, for callers that batch writes.
+
+    Validation happens before anything is written, so a message rejected with
+    an exception leaves the transaction as it was.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        message (MessageCreate): The message to add
+        account_id (int): The id of the account posting the message
+
+    Returns:
+        DBMessage: The created message, with its id assigned
+
+    Raises:
+        Forbidden: If the message is on behalf of a different account
+        EntityNotFound: If no chat with given id exists
+        ChatMembershipRequired: If the account is not a member of the chat or does not exist
+    """
+
     if message.account_id != account_id:
         raise Forbidden("access_denied", "Cannot create message on behalf of different account")
-    chat = get_by_id(session, chat_id)
-
-    account = session.get(DBAccount, message.account_id)
-    accounts = get_accounts_for_chat(session, chat_id)
-    if account is None or not any(acc.id == message.account_id for acc in accounts):
+    # a membership implies the chat exists; look the chat up only to tell
+    # which error applies
+    if get_membership_by_ids(session, chat_id, message.account_id) is None:
+        get_by_id(session, chat_id)
         raise ChatMembershipRequired(message.account_id, chat_id)
     
     new_message = DBMessage(text=message.text, account_id=message.account_id, chat_id=chat_id)
 
     session.add(new_message)
-    session.commit()
+    session.flush()
+    db_changes.record_change(session, chat_id, new_message.id, db_changes.CREATED)
+    db_counters.message_added(session, new_message)
 
     return new_message
 
+def add_messages(
+    session: Session,
+    chat_id: int,
+    messages: list[MessageCreate],
+    account_id: int,
+) -> list[DBMessage | CustomHTTPException]:
+    """Add many messages to a chat, for imports and bots.
+
+    Membership is checked with one query for all authors. Accepted messages are
+    inserted with executemany in chunks of `settings.db_bulk_chunk_size`, each
+    committed with its change log entries and counter update. The owner of the
+    chat may post on behalf of its members; anyone else only as themselves.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        messages (list[MessageCreate]): The messages to add
+        account_id (int): The id of the account posting the messages
+
+    Returns:
+        list[DBMessage | CustomHTTPException]: For each message in order, the
+            created message or the reason it was rejected
+
+    Raises:
+        EntityNotFound: If no chat with given id exists
+    """
+
+    chat = get_by_id(session, chat_id)
+    authors = {message.account_id for message in messages}
+    members = set(session.exec(
+        select(DBChatMembership.account_id)
+        .where(DBChatMembership.chat_id == chat_id, DBChatMembership.account_id.in_(authors))
+    ))
+
+    results: list[DBMessage | CustomHTTPException | None] = [None] * len(messages)
+    accepted = []
+    for index, message in enumerate(messages):
+        if message.account_id != account_id and chat.owner_id != account_id:
+            results[index] = Forbidden("access_denied", "Cannot create message on behalf of different account")
+        elif message.account_id not in members:
+            results[index] = ChatMembershipRequired(message.account_id, chat_id)
+        else:
+            accepted.append(index)
+
+    chunk_size = settings.db_bulk_chunk_size or len(accepted) or 1
+    for start in range(0, len(accepted), chunk_size):
+        chunk = accepted[start:start + chunk_size]
+        created_at = datetime.now()
+        rows = [
+            {"text": messages[index].text, "account_id": messages[index].account_id, "chat_id": chat_id, "created_at": created_at}
+            for index in chunk
+        ]
+        message_ids = session.scalars(
+            insert(DBMessage).returning(DBMessage.id, sort_by_parameter_order=True),
+            rows,
+        ).all()
+        new_messages = [DBMessage(id=message_id, **row) for message_id, row in zip(message_ids, rows)]
+        db_changes.record_changes(session, chat_id, message_ids, db_changes.CREATED)
+        db_counters.messages_added(session, chat_id, len(new_messages), new_messages[-1])
+        session.commit()
+        for index, new_message in zip(chunk, new_messages):
+            results[index] = new_message
+
+    return results
+
 def update_message(session: Session, chat_id: int, message_id: int, message: MessageUpdate) -> DBMessage:
     """Update a message in a chat.
     
@@ -242,17 +625,15 @@ def update_message(session: Session, chat_id: int, message_id: int, message: Mes
         EntityNotFound: If no message with given id exists
     """
 
-    chat = get_by_id(session, chat_id)
-    messages = get_messages_for_chat(session, chat_id)
-
     existing_message = session.get(DBMessage, message_id)
-    if existing_message is None or not any(msg.id == message_id for msg in messages):
+    if existing_message is None or existing_message.chat_id != chat_id:
+        get_by_id(session, chat_id)
         raise EntityNotFound("message", message_id)
     
     setattr(existing_message, "text", message.text)
+    db_changes.record_change(session, chat_id, message_id, db_changes.UPDATED)
 
     session.commit()
-    session.refresh(existing_message)
 
     return existing_message
     
@@ -276,6 +657,9 @@ def delete_message(session: Session, chat_id: int, message_id: int):
         raise EntityNotFound("message", message_id)
     
     session.delete(message)
+    session.flush()
+    db_changes.record_change(session, chat_id, message_id, db_changes.DELETED)
+    db_counters.message_removed(session, chat_id, message_id)
     session.commit()
 
 def add_membership(session: Session, chat_id: int, chat_membership: ChatMembershipCreate) -> DBChatMembership:
@@ -299,6 +683,8 @@ def add_membership(session: Session, chat_id: int, chat_membership: ChatMembersh
     
     membership = DBChatMembership(account_id=chat_membership.account_id, chat_id=chat_id)
     session.add(membership)
+    session.flush()
+    db_counters.members_changed(session, chat_id, 1)
     session.commit()
     return membership
 
@@ -315,10 +701,50 @@ def get_membership_by_ids(session: Session, chat_id: int, account_id: int) -> DB
 
     """
 
-    return session.exec(select(DBChatMembership).filter_by(chat_id=chat_id, account_id=account_id)).first()
+    # primary key lookup: served from the identity map when already loaded,
+    # otherwise a single indexed read of chat_memberships
+    return session.get(DBChatMembership, {"account_id": account_id, "chat_id": chat_id})
+
+def is_member(session: Session, chat_id: int, account_id: int) -> bool:
+    """Check whether an account is a member of a chat.
+    
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        account_id (int): The id of the account
+
+    Returns:
+        bool: Whether the membership exists
+    """
+
+    return get_membership_by_ids(session, chat_id, account_id) is not None
+
+def require_membership(session: Session, chat_id: int, account_id: int) -> DBChatMembership:
+    """Retrieve a membership, failing if the account is not a member of the chat.
+    
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        account_id (int): The id of the account
+
+    Returns:
+        DBChatMembership: The membership
+
+    Raises:
+        ChatMembershipRequired: If the account is not a member of the chat
+    """
+
+    membership = get_membership_by_ids(session, chat_id, account_id)
+    if membership is None:
+        raise ChatMembershipRequired(account_id, chat_id)
+    return membership
 
 def delete_membership(session: Session, chat_id: int, account_id: int):
     """Delete a membership from a chat.
+
+    The member's messages stay in the chat without an author. They are updated
+    with bulk statements, in chunks of `settings.db_bulk_chunk_size` committed
+    one at a time; the membership itself goes in the final transaction.
     
     Args: 
         session (Session): The database session
@@ -332,18 +758,19 @@ def delete_membership(session: Session, chat_id: int, account_id: int):
     """
 
     chat = get_by_id(session, chat_id)
-    account = session.get(DBAccount, account_id)
-    membership = get_membership_by_ids(session, chat_id, account_id)
-
-    if not membership or not account:
-        raise ChatMembershipRequired(account_id=account_id, chat_id=chat_id)
+    membership = require_membership(session, chat_id, account_id)
 
     if chat.owner_id == account_id:
         raise ChatOwnerRemoval()
-    
-    messages = session.exec(select(DBMessage).filter_by(chat_id=chat_id, account_id=account_id))
-    for msg in messages:
-        setattr(msg, "account_id", None)
-    
+
+    def clear_author(session: Session, message_ids):
+        db_changes.record_author_removed(session, account_id, chat_id, message_ids)
+        session.execute(
+            update(DBMessage).where(DBMessage.id.in_(message_ids)).values(account_id=None),
+            execution_options={"synchronize_session": "fetch"},
+        )
+
+    db_bulk.in_chunks(session, member_messages_query(chat_id, account_id).with_only_columns(DBMessage.id), clear_author)
     session.delete(membership)
+    db_counters.members_changed(session, chat_id, -1)
     session.commit()
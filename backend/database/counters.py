@@ -0,0 +1,169 @@
+"""Denormalized counters of chats.
+
+`DBChat` carries its number of messages and members and a pointer to its latest
+message, so listings can show them without scanning `messages` or
+`chat_memberships`. Every write that changes them updates them in SQL, as part of
+the caller's transaction, so concurrent writers never lose an increment.
+
+`recompute` rebuilds them from the underlying tables; `backend.database.repair`
+runs it against the configured database.
+"""
+
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.orm.util import identity_key
+from sqlmodel import Session, select
+
+from backend.database.schema import DBChat, DBChatMembership, DBMessage
+
+COUNTERS = ("message_count", "member_count", "last_message_id", "last_message_at")
+
+
+def _expire(session: Session, chat_id: int):
+    # the updates bypass the identity map, so drop any stale copy of the chat
+    chat = session.identity_map.get(identity_key(DBChat, chat_id))
+    if chat is not None:
+        session.expire(chat, COUNTERS)
+
+
+def _latest_message(chat_id):
+    return (
+        select(DBMessage.id, DBMessage.created_at)
+        .where(DBMessage.chat_id == chat_id)
+        .order_by(DBMessage.created_at.desc(), DBMessage.id.desc())
+        .limit(1)
+    )
+
+
+def message_added(session: Session, message: DBMessage):
+    """Count a new message and make it the latest one if it is newest.
+
+    Args:
+        session (Session): The database session
+        message (DBMessage): The message, already flushed
+    """
+
+    messages_added(session, message.chat_id, 1, message)
+
+
+def messages_added(session: Session, chat_id: int, count: int, newest: DBMessage):
+    """Count new messages of a chat in one statement.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        count (int): The number of messages added
+        newest (DBMessage): The newest of them by (created_at, id), already flushed
+    """
+
+    newer = or_(
+        DBChat.last_message_at.is_(None),
+        DBChat.last_message_at < newest.created_at,
+        and_(DBChat.last_message_at == newest.created_at, DBChat.last_message_id < newest.id),
+    )
+    session.execute(
+        update(DBChat)
+        .where(DBChat.id == chat_id)
+        .values(
+            message_count=DBChat.message_count + count,
+            last_message_id=case((newer, newest.id), else_=DBChat.last_message_id),
+            last_message_at=case((newer, newest.created_at), else_=DBChat.last_message_at),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    _expire(session, chat_id)
+
+
+def message_removed(session: Session, chat_id: int, message_id: int):
+    """Uncount a deleted message, moving the latest message back if needed.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        message_id (int): The id of the message, already deleted and flushed
+    """
+
+    latest = _latest_message(DBChat.id).correlate(DBChat)
+    was_latest = DBChat.last_message_id == message_id
+    session.execute(
+        update(DBChat)
+        .where(DBChat.id == chat_id)
+        .values(
+            message_count=DBChat.message_count - 1,
+            last_message_id=case(
+                (was_latest, latest.with_only_columns(DBMessage.id).scalar_subquery()),
+                else_=DBChat.last_message_id,
+            ),
+            last_message_at=case(
+                (was_latest, latest.with_only_columns(DBMessage.created_at).scalar_subquery()),
+                else_=DBChat.last_message_at,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    _expire(session, chat_id)
+
+
+def members_changed(session: Session, chat_id: int, delta: int):
+    """Adjust the member count of a chat.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat
+        delta (int): The number of members added, negative for removals
+    """
+
+    session.execute(
+        update(DBChat)
+        .where(DBChat.id == chat_id)
+        .values(member_count=DBChat.member_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+    _expire(session, chat_id)
+
+
+def account_removed(session: Session, account_id: int):
+    """Uncount an account from every chat it is a member of, in one statement.
+
+    Must run before its memberships are deleted.
+
+    Args:
+        session (Session): The database session
+        account_id (int): The id of the account being removed
+    """
+
+    chat_ids = select(DBChatMembership.chat_id).where(DBChatMembership.account_id == account_id)
+    session.execute(
+        update(DBChat)
+        .where(DBChat.id.in_(chat_ids))
+        .values(member_count=DBChat.member_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    for chat_id in session.exec(chat_ids):
+        _expire(session, chat_id)
+
+
+def recompute(session: Session, chat_ids: list[int] | None = None) -> int:
+    """Rebuild the counters from `messages` and `chat_memberships`.
+
+    Args:
+        session (Session): The database session
+        chat_ids (list[int] | None): Only repair these chats, all chats if not given
+
+    Returns:
+        int: The number of chats whose counters were rewritten
+    """
+
+    latest = _latest_message(DBChat.id).correlate(DBChat)
+    stmt = update(DBChat).values(
+        message_count=select(func.count()).where(DBMessage.chat_id == DBChat.id).correlate(DBChat).scalar_subquery(),
+        member_count=select(func.count()).where(DBChatMembership.chat_id == DBChat.id).correlate(DBChat).scalar_subquery(),
+        last_message_id=latest.with_only_columns(DBMessage.id).scalar_subquery(),
+        last_message_at=latest.with_only_columns(DBMessage.created_at).scalar_subquery(),
+    )
+    if chat_ids is not None:
+        stmt = stmt.where(DBChat.id.in_(chat_ids))
+    result = session.execute(stmt.execution_options(synchronize_session=False))
+    session.commit()
+    session.expire_all()
+    return result.rowcount
+
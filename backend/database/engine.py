@@ -0,0 +1,116 @@
+"""Database engines built from the application settings."""
+
+import time
+from typing import Any
+
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from sqlmodel import create_engine
+
+from backend import metrics
+from backend.config import Settings
+from backend.database.sqlite import apply_pragma_profile
+
+# drivers used by the async engine for each backend; psycopg 3 serves both modes
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+psycopg",
+}
+
+
+class _TimedCheckout:
+    # records how long each checkout waited for a connection, opening one included
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.pool_checkout_wait.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    """The default pool, timing checkouts for `metrics.pool_checkout_wait`."""
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """The default async pool, timing checkouts for `metrics.pool_checkout_wait`."""
+
+
+def is_sqlite(settings: Settings) -> bool:
+    """Whether SQLite-specific options apply, detected from the url unless set explicitly."""
+
+    if settings.db_sqlite is not None:
+        return settings.db_sqlite
+    return make_url(settings.db_url).get_backend_name() == "sqlite"
+
+
+def async_url(url: str | URL) -> URL:
+    """Swap the driver of a database url for its async counterpart."""
+
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def engine_options(settings: Settings, url: str | URL, is_async: bool = False) -> dict[str, Any]:
+    """Keyword arguments for `create_engine` / `create_async_engine`.
+
+    Args:
+        settings (Settings): The application settings
+        url (str | URL): The database url
+        is_async (bool): Whether the options are for `create_async_engine`
+
+    Returns:
+        dict[str, Any]: The engine options
+    """
+
+    url = make_url(url)
+    options: dict[str, Any] = {
+        "echo": settings.db_echo,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # an in-memory database only exists on its one connection
+            options["poolclass"] = StaticPool
+            return options
+    options["poolclass"] = TimedAsyncQueuePool if is_async else TimedQueuePool
+    options["pool_size"] = settings.db_pool_size
+    options["max_overflow"] = settings.db_max_overflow
+    options["pool_timeout"] = settings.db_pool_timeout
+    return options
+
+
+def create_engine_from_settings(settings: Settings) -> Engine:
+    """Build the sync engine for `settings.db_url`.
+
+    Args:
+        settings (Settings): The application settings
+
+    Returns:
+        Engine: The database engine
+    """
+
+    engine = create_engine(settings.db_url, **engine_options(settings, settings.db_url))
+    if is_sqlite(settings):
+        apply_pragma_profile(engine, settings.db_sqlite_profile, settings.db_sqlite_pragmas)
+    return engine
+
+
+def create_async_engine_from_settings(settings: Settings) -> AsyncEngine:
+    """Build the async engine for `settings.db_url`, using the matching async driver.
+
+    Args:
+        settings (Settings): The application settings
+
+    Returns:
+        AsyncEngine: The async database engine
+    """
+
+    url = async_url(settings.db_url)
+    engine = create_async_engine(url, **engine_options(settings, url, is_async=True))
+    if is_sqlite(settings):
+        apply_pragma_profile(engine.sync_engine, settings.db_sqlite_profile, settings.db_sqlite_pragmas)
+    return engine
@@ -0,0 +1,227 @@
+"""Generate a synthetic dataset for load tests.
+
+Sizes follow skewed, heavy-tailed distributions, as real chats do: most chats are
+small and quiet, a few are large and busy, and within a chat a few members write
+most of the messages. Rows are generated lazily and inserted with executemany in
+chunked transactions, so memory stays flat however many messages are requested.
+
+The target is the configured database (`DB_URL`); new rows get ids after the
+existing ones. For example, a database of about two million messages:
+
+    python -m backend.database.generate --accounts 20000 --chats 4000 \\
+        --members-per-chat 8 --messages-per-chat 500
+"""
+
+import argparse
+import bisect
+import itertools
+import random
+from datetime import datetime, timedelta
+from typing import Iterator
+
+import bcrypt
+from sqlalchemy import func, insert
+from sqlmodel import Session, select
+
+from backend.database import bulk as db_bulk
+from backend.database import counters as db_counters
+from backend.database import search as db_search
+from backend.database.schema import DBAccount, DBChat, DBChatMembership, DBMessage
+
+# every generated account shares this password, hashed once
+PASSWORD = "password"
+
+
+class Skewed:
+    """Heavy-tailed sizes around a mean, and popularity-weighted picks."""
+
+    def __init__(self, rng: random.Random, skew: float):
+        self.rng = rng
+        # a Pareto distribution with shape alpha has mean alpha / (alpha - 1)
+        self.alpha = 1 + 1 / skew
+        self.pareto_mean = self.alpha / (self.alpha - 1)
+
+    def size(self, mean: float, low: int, high: int) -> int:
+        """A random size with the given mean before clamping to [low, high]."""
+
+        value = mean * self.rng.paretovariate(self.alpha) / self.pareto_mean
+        return max(low, min(high, round(value)))
+
+    @staticmethod
+    def weights(count: int, exponent: float = 1.0) -> list[float]:
+        """Cumulative Zipf weights of `count` ranked items."""
+
+        return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+    def pick(self, cum_weights: list[float]) -> int:
+        """The index of an item chosen by its cumulative weight."""
+
+        return bisect.bisect(cum_weights, self.rng.random() * cum_weights[-1])
+
+    def sample(self, cum_weights: list[float], k: int) -> list[int]:
+        """`k` distinct indexes chosen by their cumulative weights."""
+
+        if 2 * k > len(cum_weights):
+            # rejection sampling would take long to find the rare items
+            return self.rng.sample(range(len(cum_weights)), k)
+        chosen: dict[int, None] = {}
+        while len(chosen) < k:
+            chosen[self.pick(cum_weights)] = None
+        return list(chosen)
+
+
+def _next_id(session: Session, column) -> int:
+    return (session.exec(select(func.max(column))).one() or 0) + 1
+
+
+def generate(
+    session: Session,
+    accounts: int,
+    chats: int,
+    members_per_chat: float,
+    messages_per_chat: float,
+    skew: float = 1.0,
+    seed: int | None = None,
+    chunk_size: int | None = None,
+    start: datetime | None = None,
+    days: int = 365,
+) -> dict[str, int]:
+    """Insert a synthetic dataset.
+
+    Args:
+        session (Session): The database session
+        accounts (int): The number of accounts
+        chats (int): The number of chats
+        members_per_chat (float): The mean number of members of a chat
+        messages_per_chat (float): The mean number of messages of a chat
+        skew (float): How heavy the tails of chat sizes are; 0 makes every chat
+            the mean size
+        seed (int | None): Seed of the random generator, for repeatable datasets
+        chunk_size (int | None): The number of rows per transaction
+        start (datetime | None): The time of the earliest message, defaults to
+            `days` days ago
+        days (int): The span of time messages are spread over
+
+    Returns:
+        dict[str, int]: The number of rows inserted per table
+    """
+
+    rng = random.Random(seed)
+    skewed = Skewed(rng, skew) if skew > 0 else None
+    start = start or datetime.now() - timedelta(days=days)
+    span = timedelta(days=days).total_seconds()
+    hashed_password = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(4)).decode()
+
+    first_account = _next_id(session, DBAccount.id)
+    first_chat = _next_id(session, DBChat.id)
+    first_message = _next_id(session, DBMessage.id)
+    account_weights = Skewed.weights(accounts)
+
+    def size(mean: float, low: int, high: int) -> int:
+        return skewed.size(mean, low, high) if skewed else max(low, min(high, round(mean)))
+
+    def account_rows() -> Iterator[dict]:
+        for account_id in range(first_account, first_account + accounts):
+            yield {
+                "id": account_id,
+                "username": f"user{account_id}",
+                "email": f"user{account_id}@example.com",
+                "hashed_password": hashed_password,
+            }
+
+    # members of each chat, as offsets into the generated accounts; popular
+    # accounts belong to many chats
+    members: list[list[int]] = []
+    for _ in range(chats):
+        count = size(members_per_chat, 1, accounts)
+        if skewed:
+            members.append(skewed.sample(account_weights, count))
+        else:
+            members.append(rng.sample(range(accounts), count))
+
+    def chat_rows() -> Iterator[dict]:
+        for offset, chat_members in enumerate(members):
+            chat_id = first_chat + offset
+            yield {"id": chat_id, "name": f"chat{chat_id}", "owner_id": first_account + chat_members[0]}
+
+    def membership_rows() -> Iterator[dict]:
+        for offset, chat_members in enumerate(members):
+            for member in chat_members:
+                yield {"chat_id": first_chat + offset, "account_id": first_account + member}
+
+    counts = {"messages": 0}
+
+    def message_rows() -> Iterator[dict]:
+        message_id = first_message
+        for offset, chat_members in enumerate(members):
+            count = size(messages_per_chat, 0, 100 * max(1, round(messages_per_chat)))
+            author_weights = Skewed.weights(len(chat_members))
+            times = sorted(rng.random() * span for _ in range(count))
+            for seconds in times:
+                author = chat_members[skewed.pick(author_weights) if skewed else rng.randrange(len(chat_members))]
+                yield {
+                    "id": message_id,
+                    "text": " ".join(rng.choices(WORDS, k=rng.randint(3, 25))),
+                    "account_id": first_account + author,
+                    "chat_id": first_chat + offset,
+                    "created_at": start + timedelta(seconds=seconds),
+                }
+                message_id += 1
+            counts["messages"] += count
+
+    sqlite = session.get_bind().dialect.name == "sqlite"
+    if sqlite:
+        # index once at the end instead of row by row through the triggers
+        db_search.drop_search_index(session.connection())
+        session.commit()
+
+    counts["accounts"] = db_bulk.insert_chunks(session, insert(DBAccount.__table__), account_rows(), chunk_size)
+    counts["chats"] = db_bulk.insert_chunks(session, insert(DBChat.__table__), chat_rows(), chunk_size)
+    counts["memberships"] = db_bulk.insert_chunks(session, insert(DBChatMembership.__table__), membership_rows(), chunk_size)
+    db_bulk.insert_chunks(session, insert(DBMessage.__table__), message_rows(), chunk_size)
+
+    if sqlite:
+        db_search.install_search_index(session.connection())
+        session.commit()
+    db_counters.recompute(session, list(range(first_chat, first_chat + chats)))
+    return counts
+
+
+WORDS = (
+    "pony express saddle rider mail station relay trail dust canyon river ford "
+    "horse gallop letter parcel telegraph frontier desert prairie mountain pass "
+    "schedule delay storm sunrise sunset camp fire coffee beans boots spurs hat "
+    "map compass route north south east west fast slow tired fresh ready waiting "
+    "arrived left today tomorrow yesterday morning evening night noon soon later "
+    "yes no maybe sure thanks hello bye again please sorry great good bad okay"
+).split()
+
+
+if __name__ == "__main__":
+    from backend.dependencies import create_db_tables, engine
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--members-per-chat", type=float, default=5)
+    parser.add_argument("--messages-per-chat", type=float, default=100)
+    parser.add_argument("--skew", type=float, default=1.0, help="tail heaviness of chat sizes, 0 for uniform")
+    parser.add_argument("--days", type=int, default=365, help="span of time messages are spread over")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    create_db_tables()
+    with Session(engine) as session:
+        counts = generate(
+            session,
+            accounts=args.accounts,
+            chats=args.chats,
+            members_per_chat=args.members_per_chat,
+            messages_per_chat=args.messages_per_chat,
+            skew=args.skew,
+            seed=args.seed,
+            chunk_size=args.chunk_size,
+            days=args.days,
+        )
+    print(counts)
@@ -0,0 +1,218 @@
+"""Persistent queue of background jobs.
+
+Work too heavy for a request, such as deleting a large chat, is stored as a row
+of `jobs` and answered with 202 Accepted. Workers in `backend.jobs` claim queued
+jobs one at a time and run their handler, which reports progress on the job row
+after each batch so `GET /jobs/{job_id}` can show how far along it is.
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from backend.config import settings
+from backend.database import accounts as db_accounts
+from backend.database import chats as db_chats
+from backend.database.schema import DBJob, DBMessage
+from backend.exceptions import ChatOwnerRemoval, CustomHTTPException, EntityNotFound
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+DELETE_CHAT = "delete_chat"
+DELETE_ACCOUNT = "delete_account"
+
+
+def next_job_query():
+    return select(DBJob.id).where(DBJob.status == QUEUED).order_by(DBJob.id).limit(1)
+
+
+def get_by_id(session: Session, job_id: int) -> DBJob:
+    """Retrieve a job from the database.
+
+    Args:
+        session (Session): The database session
+        job_id (int): The id of the job
+
+    Returns:
+        DBJob: The job
+
+    Raises:
+        EntityNotFound: If no job with given id exists
+    """
+
+    job = session.get(DBJob, job_id)
+    if job is None:
+        raise EntityNotFound("job", job_id)
+    return job
+
+
+def enqueue(session: Session, kind: str, params: dict, total: int | None = None) -> DBJob:
+    """Queue a job.
+
+    Args:
+        session (Session): The database session
+        kind (str): The handler to run, a key of `HANDLERS`
+        params (dict): The arguments of the handler
+        total (int | None): The estimated number of rows the job will process
+
+    Returns:
+        DBJob: The queued job
+    """
+
+    job = DBJob(kind=kind, params=params, status=QUEUED, total=total)
+    session.add(job)
+    session.commit()
+    return job
+
+
+def enqueue_chat_deletion(session: Session, chat_id: int) -> DBJob:
+    """Queue the deletion of a chat.
+
+    Args:
+        session (Session): The database session
+        chat_id (int): The id of the chat to delete
+
+    Returns:
+        DBJob: The queued job
+
+    Raises:
+        EntityNotFound: If no chat with given id exists
+    """
+
+    chat = db_chats.get_by_id(session, chat_id)
+    return enqueue(session, DELETE_CHAT, {"chat_id": chat_id}, total=chat.message_count)
+
+
+def enqueue_account_deletion(session: Session, account_id: int) -> DBJob:
+    """Queue the deletion of an account.
+
+    Args:
+        session (Session): The database session
+        account_id (int): The id of the account to delete
+
+    Returns:
+        DBJob: The queued job
+
+    Raises:
+        EntityNotFound: If no account with given id exists
+        ChatOwnerRemoval: If the account still owns chats
+    """
+
+    db_accounts.get_by_id(session, account_id)
+    # checked again when the job runs, but reported to the caller right away
+    if session.exec(db_accounts.owned_chats_query(account_id)).first() is not None:
+        raise ChatOwnerRemoval()
+    total = session.exec(select(func.count()).where(DBMessage.account_id == account_id)).one()
+    return enqueue(session, DELETE_ACCOUNT, {"account_id": account_id}, total=total)
+
+
+def _delete_chat(session: Session, params: dict, on_chunk: Callable[[int], None]):
+    try:
+        db_chats.delete_chat(session, params["chat_id"], on_chunk=on_chunk)
+    except EntityNotFound:
+        # already deleted, by an earlier attempt at this job or by another request
+        pass
+
+
+def _delete_account(session: Session, params: dict, on_chunk: Callable[[int], None]):
+    try:
+        db_accounts.delete_account(session, params["account_id"], on_chunk=on_chunk)
+    except EntityNotFound:
+        pass
+
+
+# handlers must be safe to run again from the start: a job interrupted by a
+# restart is requeued by `requeue_stale`
+HANDLERS: dict[str, Callable[[Session, dict, Callable[[int], None]], None]] = {
+    DELETE_CHAT: _delete_chat,
+    DELETE_ACCOUNT: _delete_account,
+}
+
+
+def claim_next(session: Session) -> DBJob | None:
+    """Mark the oldest queued job as running and return it.
+
+    The claim is a single conditional UPDATE, so several workers, in this
+    process or others, never claim the same job.
+
+    Args:
+        session (Session): The database session
+
+    Returns:
+        DBJob | None: The claimed job, None if the queue is empty
+    """
+
+    oldest = next_job_query().scalar_subquery()
+    job_id = session.execute(
+        update(DBJob)
+        .where(DBJob.id == oldest, DBJob.status == QUEUED)
+        .values(status=RUNNING, progress=0, updated_at=datetime.now())
+        .returning(DBJob.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    session.commit()
+    return None if job_id is None else session.get(DBJob, job_id, populate_existing=True)
+
+
+def run(session: Session, job: DBJob):
+    """Run a claimed job to completion and record its outcome.
+
+    After every batch the job's progress is committed and the worker pauses
+    for `settings.jobs_throttle` seconds, leaving room for request traffic.
+
+    Args:
+        session (Session): The database session
+        job (DBJob): The job, as returned by `claim_next`
+    """
+
+    def on_chunk(count: int):
+        job.progress += count
+        job.updated_at = datetime.now()
+        session.add(job)
+        session.commit()
+        if settings.jobs_throttle:
+            time.sleep(settings.jobs_throttle)
+
+    try:
+        HANDLERS[job.kind](session, job.params, on_chunk)
+    except Exception as exception:
+        session.rollback()
+        job.status = FAILED
+        if isinstance(exception, CustomHTTPException):
+            job.error = exception.content.message
+        else:
+            job.error = repr(exception)
+    else:
+        job.status = SUCCEEDED
+    job.updated_at = job.finished_at = datetime.now()
+    session.add(job)
+    session.commit()
+
+
+def requeue_stale(session: Session) -> int:
+    """Requeue running jobs that have not reported progress for a while.
+
+    Their worker is assumed to have died, typically in a restart.
+
+    Args:
+        session (Session): The database session
+
+    Returns:
+        int: The number of requeued jobs
+    """
+
+    cutoff = datetime.now() - timedelta(seconds=settings.jobs_stale_after)
+    result = session.execute(
+        update(DBJob)
+        .where(DBJob.status == RUNNING, DBJob.updated_at < cutoff)
+        .values(status=QUEUED, updated_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return result.rowcount
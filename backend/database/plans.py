@@ -0,0 +1,117 @@
+"""Query plan checks for the hot queries.
+
+Each entry in `HOT_QUERIES` is built with the same statement builders the
+database functions use, so a missing or unusable index shows up here as a full
+table scan in SQLite's `EXPLAIN QUERY PLAN` output.
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+from backend.database import accounts as db_accounts
+from backend.database import changes as db_changes
+from backend.database import jobs as db_jobs
+from backend.database import search as db_search
+from backend.database import chats as db_chats
+from backend.models.chats import MessageCursor
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_CURSOR = MessageCursor(created_at=datetime(2000, 1, 1), id=1)
+
+HOT_QUERIES = {
+    "messages_page": lambda: db_chats.messages_page_query(1, 50),
+    "messages_page_before": lambda: db_chats.messages_page_query(1, 50, before=_SAMPLE_CURSOR),
+    "messages_page_after": lambda: db_chats.messages_page_query(1, 50, after=_SAMPLE_CURSOR),
+    "messages_export": lambda: db_chats.messages_export_query(1, _SAMPLE_CURSOR),
+    "messages_page_with_authors": lambda: db_chats.messages_page_query(1, 50, with_authors=True),
+    "chat_messages": lambda: db_chats.chat_messages_query(1),
+    "member_messages": lambda: db_chats.member_messages_query(1, 1),
+    "chat_memberships": lambda: db_chats.chat_memberships_query(1),
+    "chat_accounts": lambda: db_chats.chat_accounts_query(1),
+    "chat_by_name": lambda: db_chats.chat_by_name_query("name"),
+    "account_by_username": lambda: db_accounts.account_by_username_query("username"),
+    "account_by_email": lambda: db_accounts.account_by_email_query("email"),
+    "owned_chats": lambda: db_accounts.owned_chats_query(1),
+    "accounts_by_ids": lambda: db_accounts.accounts_by_ids_query([1, 2, 3]),
+    "inbox": lambda: db_chats.inbox_query(1),
+    "next_job": lambda: db_jobs.next_job_query(),
+    "message_changes": lambda: db_changes.changes_query(1, 0, 100),
+    "search_chat": lambda: db_search.search_query('"word"*', 20, 0, chat_id=1),
+    "search_member_chats": lambda: db_search.search_query('"word"*', 20, 0, account_id=1),
+}
+
+
+def explain(connection: Connection, stmt) -> list[str]:
+    """Return the `EXPLAIN QUERY PLAN` details of a statement.
+
+    Args:
+        connection (Connection): A connection to a SQLite database
+        stmt: The statement to explain
+
+    Returns:
+        list[str]: One line per step of the query plan
+    """
+
+    compiled = stmt.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    # the plan is fixed when the statement is prepared, so the bound values do not matter
+    parameters = (None,) * len(compiled.positiontup or ())
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", parameters)
+    return [row[3] for row in rows]
+
+
+def is_full_scan(detail: str) -> bool:
+    """Whether a query plan step reads a whole table or index.
+
+    SQLite reports lookups bounded by an equality or range as `SEARCH`, so a
+    `SCAN` of a table reads all of it, through an index (`USING INDEX`,
+    `USING COVERING INDEX`) or not. Scans of subqueries and other derived rows
+    are not table scans.
+    """
+
+    if not detail.startswith("SCAN "):
+        return False
+    return detail.split()[1] in SQLModel.metadata.tables
+
+
+def find_full_scans(connection: Connection) -> dict[str, list[str]]:
+    """Explain every hot query and collect the ones that scan a whole table.
+
+    Args:
+        connection (Connection): A connection to a SQLite database
+
+    Returns:
+        dict[str, list[str]]: The offending plan steps, keyed by query name
+    """
+
+    scans = {}
+    for name, build in HOT_QUERIES.items():
+        details = [detail for detail in explain(connection, build()) if is_full_scan(detail)]
+        if details:
+            scans[name] = details
+    return scans
+
+
+def check_query_plans(engine: Engine) -> dict[str, list[str]]:
+    """Log a warning for every hot query that still does a full table scan.
+
+    Only SQLite is inspected; other databases are skipped.
+
+    Args:
+        engine (Engine): The database engine
+
+    Returns:
+        dict[str, list[str]]: The offending plan steps, keyed by query name
+    """
+
+    if engine.dialect.name != "sqlite":
+        return {}
+
+    with engine.connect() as connection:
+        scans = find_full_scans(connection)
+    for name, details in scans.items():
+        logger.warning("query %s does a full table scan: %s", name, "; ".join(details))
+    return scans
@@ -0,0 +1,149 @@
+"""Per-request SQL statement counts and timings.
+
+`track_queries` opens a `QueryStats` for the current context; while it is open,
+every statement executed by any engine in that context is counted and timed
+through the `before_cursor_execute` / `after_cursor_execute` events. Database
+work run in the threadpool or through `AsyncSession.run_sync` shares the
+request's context, so it is counted too. Outside of `track_queries`, such as in
+job workers, the events cost a context variable lookup.
+
+`QueryStatsMiddleware` wraps each request with it. With `settings.db_query_stats`
+enabled, it reports the totals in a `Server-Timing` header and a debug log line,
+and warns about statements repeated often enough in one request to suggest an
+N+1 query.
+
+Independently, statements slower than `settings.db_slow_query_threshold` are
+handed to `backend.database.slow_queries`, with the route of the request they
+ran for when there is one.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.config import settings
+from backend.database.slow_queries import log_slow_query
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """The statements executed within a `track_queries` block."""
+
+    def __init__(self, scope: dict | None = None):
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter[str] = Counter()
+
+    @property
+    def route(self) -> str | None:
+        """The route template of the request, once routed, else its path."""
+
+        if self.scope is None:
+            return None
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path")
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements executed at least `threshold` times, most repeated first."""
+
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def server_timing(self) -> str:
+        """The totals as a `Server-Timing` header value."""
+
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(scope: dict | None = None) -> Iterator[QueryStats]:
+    """Count the statements executed in the current context.
+
+    Args:
+        scope (dict | None): The ASGI scope of the request being served
+
+    Yields:
+        QueryStats: The counts, updated as statements run
+    """
+
+    stats = QueryStats(scope)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None or settings.db_slow_query_threshold is not None:
+        connection.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    started = connection.info.pop("query_started", None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.duration += duration
+        stats.count += 1
+        stats.statements[statement] += 1
+    threshold = settings.db_slow_query_threshold
+    if threshold is not None and duration >= threshold:
+        log_slow_query(connection, statement, parameters, executemany, duration, stats and stats.route)
+
+
+class QueryStatsMiddleware:
+    """Track the statements of every HTTP request.
+
+    Tracking gives slow queries their route. The totals are only reported when
+    `settings.db_query_stats` is enabled, as they reveal database timings to
+    clients.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        report = settings.db_query_stats
+
+        with track_queries(scope) as stats:
+            async def send_with_timing(message: Message):
+                # statements of a streamed body run after the headers are
+                # sent, so they are logged but not part of the header
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing if report else send)
+
+        if not report:
+            return
+        logger.debug(
+            "%s %s: %d queries in %.2f ms",
+            scope["method"], scope["path"], stats.count, stats.duration * 1000,
+        )
+        for statement, count in stats.repeated(settings.db_repeated_query_threshold):
+            logger.warning(
+                "%s %s ran a statement %d times, a likely N+1 query: %s",
+                scope["method"], scope["path"], count, statement,
+            )
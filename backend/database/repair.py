@@ -0,0 +1,19 @@
+"""Recompute the denormalized chat counters of the configured database.
+
+Use after writing to the tables directly, or to upgrade a database created before
+the counters existed:
+
+    python -m backend.database.repair
+"""
+
+from sqlmodel import Session
+
+from backend.database import counters as db_counters
+from backend.dependencies import create_db_tables, engine
+
+
+if __name__ == "__main__":
+    # adds the counter columns to databases created before them
+    create_db_tables()
+    with Session(engine) as session:
+        print(f"recomputed counters of {db_counters.recompute(session)} chats")
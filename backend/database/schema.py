@@ -2,6 +2,7 @@
 
 from datetime import datetime
 
+from sqlalchemy import JSON, Index
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -11,7 +12,7 @@ class DBAccount(SQLModel, table=True):
     # fields
     id: int | None = Field(default=None, primary_key=True)
     username: str = Field(unique=True, index=True)
-    email: str = Field(unique=True)
+    email: str = Field(unique=True, index=True)
     hashed_password: str
 
     # relationships
@@ -28,8 +29,13 @@ class DBChat(SQLModel, table=True):
 
     # fields
     id: int | None = Field(default=None, primary_key=True)
-    name: str
-    owner_id: int = Field(foreign_key="accounts.id", ondelete="RESTRICT")
+    name: str = Field(index=True)
+    owner_id: int = Field(foreign_key="accounts.id", ondelete="RESTRICT", index=True)
+    # maintained by `backend.database.counters`
+    message_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    member_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    last_message_id: int | None = None
+    last_message_at: datetime | None = None
 
     # relationships
     owner: DBAccount = Relationship(back_populates="owned_chats")
@@ -45,6 +51,13 @@ class DBChat(SQLModel, table=True):
 
 class DBMessage(SQLModel, table=True):
     __tablename__ = "messages"  # type: ignore
+    __table_args__ = (
+        Index("ix_messages_chat_id_created_at_id", "chat_id", "created_at", "id"),
+        Index("ix_messages_account_id_chat_id", "account_id", "chat_id"),
+        # unread counts: the messages of a chat past a read position, covering
+        # their author
+        Index("ix_messages_chat_id_id_account_id", "chat_id", "id", "account_id"),
+    )
 
     # fields
     id: int | None = Field(default=None, primary_key=True)
@@ -67,6 +80,9 @@ class DBMessage(SQLModel, table=True):
 
 class DBChatMembership(SQLModel, table=True):
     __tablename__ = "chat_memberships"  # type: ignore
+    __table_args__ = (
+        Index("ix_chat_memberships_chat_id_account_id", "chat_id", "account_id"),
+    )
 
     # fields
     account_id: int = Field(
@@ -79,7 +95,48 @@ class DBChatMembership(SQLModel, table=True):
         primary_key=True,
         ondelete="CASCADE",
     )
+    # no foreign key: the position stays meaningful after the message is deleted
+    last_read_message_id: int | None = None
 
     # relationships
     account: DBAccount = Relationship(back_populates="memberships")
     chat: DBChat = Relationship(back_populates="memberships")
+
+
+class DBMessageChange(SQLModel, table=True):
+    __tablename__ = "message_changes"  # type: ignore
+    __table_args__ = (
+        Index("ix_message_changes_chat_id_seq", "chat_id", "seq"),
+        # never reuse a sequence number, even after the newest rows are deleted
+        {"sqlite_autoincrement": True},
+    )
+
+    # fields
+    seq: int | None = Field(default=None, primary_key=True)
+    chat_id: int = Field(
+        foreign_key="chats.id",
+        ondelete="CASCADE",
+    )
+    # no foreign key: the change outlives a deleted message
+    message_id: int
+    kind: str
+
+
+class DBJob(SQLModel, table=True):
+    __tablename__ = "jobs"  # type: ignore
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+    )
+
+    # fields
+    id: int | None = Field(default=None, primary_key=True)
+    kind: str
+    params: dict = Field(default_factory=dict, sa_type=JSON)
+    status: str
+    # rows processed so far, out of an estimated total
+    progress: int = 0
+    total: int | None = None
+    error: str | None = None
+    created_at: datetime | None = Field(default_factory=datetime.now)
+    updated_at: datetime | None = Field(default_factory=datetime.now)
+    finished_at: datetime | None = None
@@ -0,0 +1,145 @@
+"""Full-text search over message text, backed by SQLite FTS5.
+
+`messages_fts` is an external-content FTS5 table over `messages.text`: it stores
+only the index, and triggers on `messages` keep it in sync with every insert,
+edit and delete, including bulk statements that bypass the ORM.
+"""
+
+from sqlalchemy import event, func, literal_column, table, column
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from backend.database.schema import DBChatMembership, DBMessage
+from backend.exceptions import ServiceUnavailable
+
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        text, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF text ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 12
+
+_fts = table("messages_fts", column("rowid"))
+_fts_match = literal_column("messages_fts")
+
+
+def install_search_index(connection: Connection):
+    """Create the search table and its triggers if missing, indexing existing messages.
+
+    Args:
+        connection (Connection): A connection to a SQLite database
+    """
+
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+    ).first()
+    for ddl in SEARCH_DDL:
+        connection.exec_driver_sql(ddl)
+    if not exists:
+        connection.exec_driver_sql("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def drop_search_index(connection: Connection):
+    """Drop the search table and its triggers, for bulk loads.
+
+    Indexing rows one trigger at a time is much slower than rebuilding the
+    index once; `install_search_index` rebuilds it after the load.
+
+    Args:
+        connection (Connection): A connection to a SQLite database
+    """
+
+    for name in ("messages_fts_insert", "messages_fts_delete", "messages_fts_update"):
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    connection.exec_driver_sql("DROP TABLE IF EXISTS messages_fts")
+
+
+@event.listens_for(DBMessage.__table__, "after_create")
+def _install_search_index(target, connection: Connection, **kwargs):
+    if connection.dialect.name == "sqlite":
+        install_search_index(connection)
+
+
+def match_expression(query: str) -> str | None:
+    """Turn user input into a safe FTS5 query.
+
+    Every word is quoted, so FTS5 operators in the input are searched for
+    literally; all words must match, and the last one may be a prefix.
+
+    Args:
+        query (str): The search text
+
+    Returns:
+        str | None: The FTS5 query, or None if the input has no words
+    """
+
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if not terms:
+        return None
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_query(match: str, limit: int, offset: int, chat_id: int | None = None, account_id: int | None = None):
+    stmt = (
+        select(
+            DBMessage,
+            func.snippet(_fts_match, 0, SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS, SNIPPET_TOKENS).label("snippet"),
+        )
+        .select_from(_fts)
+        .join(DBMessage, DBMessage.id == _fts.c.rowid)
+        .where(_fts_match.op("MATCH")(match))
+    )
+    if chat_id is not None:
+        stmt = stmt.where(DBMessage.chat_id == chat_id)
+    if account_id is not None:
+        member_chats = select(DBChatMembership.chat_id).where(DBChatMembership.account_id == account_id)
+        stmt = stmt.where(DBMessage.chat_id.in_(member_chats))
+    return stmt.order_by(func.bm25(_fts_match), DBMessage.id).limit(limit).offset(offset)
+
+
+def search_messages(
+    session: Session,
+    match: str,
+    limit: int,
+    offset: int = 0,
+    chat_id: int | None = None,
+    account_id: int | None = None,
+) -> tuple[list[tuple[DBMessage, str]], bool]:
+    """Search message text, best matches first.
+
+    Args:
+        session (Session): The database session
+        match (str): An FTS5 query, see `match_expression`
+        limit (int): The maximum number of results
+        offset (int): The number of results to skip
+        chat_id (int | None): Only search this chat
+        account_id (int | None): Only search chats this account is a member of
+
+    Returns:
+        tuple[list[tuple[DBMessage, str]], bool]: The matching messages with a
+            highlighted snippet, and whether more results follow
+
+    Raises:
+        ServiceUnavailable: If the database is not SQLite
+    """
+
+    if session.get_bind().dialect.name != "sqlite":
+        raise ServiceUnavailable("search_unavailable", "Message search requires SQLite FTS5")
+
+    rows = list(session.exec(search_query(match, limit + 1, offset, chat_id, account_id)))
+    return [tuple(row) for row in rows[:limit]], len(rows) > limit
@@ -1,69 +1,170 @@
+"""Load a JSON dump such as `initial.json` into a database.
+
+The file is a JSON object of arrays, one per table (`accounts`, `chats`,
+`messages`, `memberships`). It is parsed incrementally, one row at a time, so
+dumps far larger than memory can be loaded; rows are inserted in chunked
+transactions, skipping those whose keys already exist, so seeding is idempotent.
+
+    python -m backend.database.seed development.db [dump.json]
+"""
+
 import json
 from datetime import datetime
+from typing import IO, Iterator
 
-from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel import Session, SQLModel, create_engine
 
+from backend.database import bulk as db_bulk
+from backend.database import counters as db_counters
 from backend.database.schema import *
 
+SECTIONS = {
+    "accounts": DBAccount,
+    "chats": DBChat,
+    "messages": DBMessage,
+    "memberships": DBChatMembership,
+}
+
 
 def get_engine(filename):
     engine = create_engine(
         f"sqlite:///{filename}",
         connect_args={"check_same_thread": False},
-        echo=True,
     )
     SQLModel.metadata.create_all(engine)
     return engine
 
 
-def seed_accounts(session, data):
-    existing_ids = set(session.exec(select(DBAccount.id)).all())
-    for account in data["accounts"]:
-        if account["id"] not in existing_ids:
-            session.add(DBAccount(**account))
-    session.commit()
-
-
-def seed_chats(session, data):
-    existing_ids = set(session.exec(select(DBChat.id)).all())
-    for chat in data["chats"]:
-        if chat["id"] not in existing_ids:
-            session.add(DBChat(**chat))
-    session.commit()
-
-
-def seed_messages(session, data):
-    existing_ids = set(session.exec(select(DBMessage.id)).all())
-    for message in data["messages"]:
-        if message["id"] not in existing_ids:
-            message["created_at"] = datetime.fromisoformat(message["created_at"])
-            session.add(DBMessage(**message))
-    session.commit()
-
-
-def seed_memberships(session, data):
-    existing_ids = set(
-        session.exec(
-            select(DBChatMembership.chat_id, DBChatMembership.account_id)
-        ).all()
-    )
-    for membership in data["memberships"]:
-        if (membership["chat_id"], membership["account_id"]) not in existing_ids:
-            session.add(DBChatMembership(**membership))
-    session.commit()
+class _JSONStream:
+    """Just enough of an incremental JSON reader for an object of arrays."""
+
+    def __init__(self, file: IO[str], read_size: int = 1 << 16):
+        self.file = file
+        self.read_size = read_size
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        data = self.file.read(self.read_size)
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return bool(data)
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("unexpected end of JSON input")
+
+    def expect(self, token: str):
+        if self.peek() != token:
+            raise ValueError(f"expected {token!r} at {self.buffer[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # most likely cut off by the end of the buffer
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self.buffer) and self._fill():
+                # a number may continue in the next read
+                continue
+            self.pos = end
+            return value
+
+
+def iter_sections(file: IO[str], read_size: int = 1 << 16) -> Iterator[tuple[str, dict]]:
+    """Yield the rows of a JSON dump one at a time, as (section, row) pairs.
+
+    Args:
+        file (IO[str]): The dump, opened for reading
+        read_size (int): The number of characters read from the file at a time
+    """
+
+    stream = _JSONStream(file, read_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        section = stream.value()
+        stream.expect(":")
+        stream.expect("[")
+        if stream.peek() == "]":
+            stream.pos += 1
+        else:
+            while True:
+                yield section, stream.value()
+                if stream.peek() == "]":
+                    stream.pos += 1
+                    break
+                stream.expect(",")
+        if stream.peek() == "}":
+            return
+        stream.expect(",")
+
+
+def _rows(first: tuple[str, dict], sections: Iterator[tuple[str, dict]], pending: list):
+    # the rows of one section, leaving the first row of the next one in pending
+    section, row = first
+    yield row
+    for next_section, row in sections:
+        if next_section != section:
+            pending.append((next_section, row))
+            return
+        yield row
+
+
+def seed(session: Session, file: IO[str], chunk_size: int | None = None) -> dict[str, int]:
+    """Insert the rows of a JSON dump, skipping rows that already exist.
+
+    Sections must come in an order that satisfies foreign keys, as in
+    `initial.json`. Chat counters are recomputed at the end.
+
+    Args:
+        session (Session): The database session
+        file (IO[str]): The dump, opened for reading
+        chunk_size (int | None): The number of rows per transaction
+
+    Returns:
+        dict[str, int]: The number of rows read per section
+    """
+
+    counts = {}
+    sections = iter_sections(file)
+    pending: list = []
+    first = next(sections, None)
+    while first is not None:
+        section = first[0]
+        table = SECTIONS[section].__table__
+        rows = _rows(first, sections, pending)
+        if section == "messages":
+            rows = (
+                {**row, "created_at": datetime.fromisoformat(row["created_at"])} if "created_at" in row else row
+                for row in rows
+            )
+        counts[section] = counts.get(section, 0) + db_bulk.insert_chunks(
+            session, db_bulk.insert_ignore(session, table), rows, chunk_size
+        )
+        first = pending.pop() if pending else None
+    db_counters.recompute(session)
+    return counts
 
 
 if __name__ == "__main__":
     import sys
 
     filename = sys.argv[1]
+    dump = sys.argv[2] if len(sys.argv) > 2 else "backend/database/initial.json"
     engine = get_engine(filename)
 
-    with open("backend/database/initial.json") as file:
-        data = json.load(file)
-
-    with Session(engine) as session:
-        seed_accounts(session, data)
-        seed_chats(session, data)
-        seed_messages(session, data)
-        seed_memberships(session, data)
+    with open(dump) as file, Session(engine) as session:
+        print(seed(session, file))
@@ -0,0 +1,141 @@
+"""Log of slow SQL statements.
+
+Statements taking at least `settings.db_slow_query_threshold` seconds are logged
+by `backend.database.profiling` through `log_slow_query`, together with the route
+of the request that ran them, their parameters with text redacted, and their
+query plan (`EXPLAIN QUERY PLAN` on SQLite, `EXPLAIN` elsewhere). Entries go to
+the `backend.database.slow_queries` logger and, when `settings.db_slow_query_log`
+is set, to that file as one JSON object per line, rotated by size.
+"""
+
+import json
+import logging
+import os
+from datetime import date, datetime, time
+from logging.handlers import RotatingFileHandler
+from typing import Any
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# statements worth explaining; DDL, pragmas and transaction control are not
+EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+# executemany parameter sets kept in an entry
+MAX_PARAMETER_SETS = 3
+
+_file_handler: RotatingFileHandler | None = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: its time, level, message and `entry` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            **getattr(record, "entry", {}),
+        }
+        return json.dumps(entry, default=str)
+
+
+def _configure():
+    # (re)attach the file handler when the configured path changes
+    global _file_handler
+    path = settings.db_slow_query_log
+    if _file_handler is not None and path and _file_handler.baseFilename == os.path.abspath(path):
+        return
+    if _file_handler is not None:
+        logger.removeHandler(_file_handler)
+        _file_handler.close()
+        _file_handler = None
+    if path:
+        _file_handler = RotatingFileHandler(
+            path,
+            maxBytes=settings.db_slow_query_log_max_bytes,
+            backupCount=settings.db_slow_query_log_backups,
+            encoding="utf-8",
+            delay=True,
+        )
+        _file_handler.setFormatter(JSONFormatter())
+        logger.addHandler(_file_handler)
+
+
+def redact(value: Any) -> Any:
+    """Parameters with their text replaced by its type and length.
+
+    Numbers, booleans, dates and NULLs are kept: they are ids, counts and
+    timestamps, which explain a plan without revealing message text, emails or
+    password hashes.
+    """
+
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float, datetime, date, time)):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def explain(connection, statement: str, parameters) -> list[str]:
+    """The query plan of a statement, one line per step.
+
+    Runs on a fresh cursor of the statement's own DBAPI connection, in its
+    transaction, so it sees the same data and fires no engine events.
+
+    Args:
+        connection (Connection): The connection that ran the statement
+        statement (str): The statement, as sent to the driver
+        parameters: Its parameters, as sent to the driver
+
+    Returns:
+        list[str]: The plan
+    """
+
+    if not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return []
+    sqlite = connection.dialect.name == "sqlite"
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(("EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN ") + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if sqlite:
+        # (id, parent, notused, detail)
+        return [row[3] for row in rows]
+    return [row[0] for row in rows]
+
+
+def log_slow_query(connection, statement: str, parameters, executemany: bool, duration: float, route: str | None):
+    """Log a slow statement with its route, redacted parameters and plan.
+
+    Args:
+        connection (Connection): The connection that ran the statement
+        statement (str): The statement
+        parameters: Its parameters, a list of parameter sets for executemany
+        executemany (bool): Whether the statement ran for many parameter sets
+        duration (float): How long it took, in seconds
+        route (str | None): The route template of the request that ran it
+    """
+
+    _configure()
+    parameter_sets = list(parameters) if executemany else [parameters]
+    try:
+        plan = explain(connection, statement, parameter_sets[0] if parameter_sets else ())
+    except Exception as exception:
+        plan = [f"EXPLAIN failed: {exception!r}"]
+    entry = {
+        "duration_ms": round(duration * 1000, 3),
+        "route": route,
+        "statement": statement,
+        "parameters": redact(parameter_sets[:MAX_PARAMETER_SETS]),
+        "executemany": len(parameter_sets) if executemany else None,
+        "plan": plan,
+    }
+    logger.warning("slow query (%.1f ms) on %s", entry["duration_ms"], route or "no route", extra={"entry": entry})
@@ -0,0 +1,137 @@
+"""Bounded cache of verified access tokens.
+
+Entries are keyed by a digest of the token, so raw tokens are never kept in
+memory, and hold the decoded claims together with a snapshot of the account's
+public fields. An entry lives until the token's `exp` claim, until it is pushed
+out by newer entries, or until its account changes.
+
+Invalidating an account bumps its generation. Callers read the generation
+before loading the account and pass it to `put`, which drops snapshots loaded
+before a concurrent invalidation instead of caching them past it.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from backend.config import settings
+from backend.database.schema import DBAccount
+from backend.models.auth import Claims
+
+
+class CachedToken(NamedTuple):
+    claims: Claims
+    account_id: int
+    username: str
+    email: str
+
+    def account(self) -> DBAccount:
+        """Build a detached account from the snapshot, without touching the database."""
+
+        return DBAccount(id=self.account_id, username=self.username, email=self.email)
+
+
+class TokenCache:
+    """Thread-safe LRU cache of verified tokens."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, CachedToken] = OrderedDict()
+        self._by_account: dict[int, set[bytes]] = {}
+        self._generations: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> CachedToken | None:
+        """Look up a token, dropping it if it has expired.
+
+        Args:
+            token (str): The access token (JWT)
+
+        Returns:
+            CachedToken | None: The cached entry, if present and unexpired
+        """
+
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.claims.exp <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def generation(self, account_id: int) -> int:
+        """The number of times an account has been invalidated.
+
+        Args:
+            account_id (int): The id of the account
+        """
+
+        with self._lock:
+            return self._generations.get(account_id, 0)
+
+    def put(self, token: str, claims: Claims, account: DBAccount, generation: int | None = None):
+        """Cache a verified token and its account.
+
+        Args:
+            token (str): The access token (JWT)
+            claims (Claims): The decoded claims of the token
+            account (DBAccount): The account the token belongs to
+            generation (int | None): The account's `generation` read before it
+                was loaded; the entry is not cached if it has changed since
+        """
+
+        if self.maxsize <= 0:
+            return
+        key = self._key(token)
+        entry = CachedToken(claims, account.id, account.username, account.email)
+        with self._lock:
+            if generation is not None and self._generations.get(account.id, 0) != generation:
+                return
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_account.setdefault(entry.account_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_account(self, account_id: int):
+        """Drop every cached token of an account.
+
+        Args:
+            account_id (int): The id of the account
+        """
+
+        with self._lock:
+            self._generations[account_id] = self._generations.get(account_id, 0) + 1
+            for key in self._by_account.pop(account_id, set()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_account.clear()
+            # generations are kept: a load in flight may still put a stale snapshot
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: bytes):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_account.get(entry.account_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_account[entry.account_id]
+
+
+token_cache = TokenCache(settings.token_cache_size)
@@ -2,22 +2,30 @@
 
 Args:
     engine (sqlalchemy.engine.Engine): The database engine
+    async_engine (sqlalchemy.ext.asyncio.AsyncEngine | None): The async database
+        engine, when `settings.db_async` is enabled
 """
-from typing import Annotated
+from typing import Annotated, Any, Callable, TypeVar
 
-from fastapi import Depends
+from fastapi import Depends, WebSocket, WebSocketException, status
 from fastapi.security import APIKeyCookie, HTTPBearer, HTTPAuthorizationCredentials
-from sqlmodel import SQLModel, create_engine, Session, text
+from sqlalchemy import Engine, inspect, text
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from backend.database.schema import *
 from backend.database import auth as db_auth
-from backend.exceptions import Forbidden, InvalidCredentials
+from backend.database import counters as db_counters
+from backend.database.engine import create_async_engine_from_settings, create_engine_from_settings
+from backend.database.plans import check_query_plans
+from backend.database.search import install_search_index
+from backend.exceptions import CustomHTTPException, Forbidden, InvalidCredentials
 from backend.config import settings
 
-_db_filename = "backend/database/development.db"
-_db_url = f"sqlite:///{_db_filename}"
-_connect_args = {"check_same_thread": False}
-engine = create_engine(_db_url, echo=True, connect_args=_connect_args)
+engine = create_engine_from_settings(settings)
+async_engine = create_async_engine_from_settings(settings) if settings.db_async else None
 cookie_scheme = APIKeyCookie(name=settings.jwt_cookie_key, auto_error=False)
 bearer_scheme = HTTPBearer(auto_error=False)
 
@@ -25,13 +33,85 @@ bearer_scheme = HTTPBearer(auto_error=False)
 def create_db_tables():
     SQLModel.metadata.create_all(engine)
     with engine.connect() as connection:
-        connection.execute(text("PRAGMA foreign_keys=ON"))
+        # likewise for columns added to existing tables, as long as existing
+        # rows can take them without a value
+        inspector = inspect(connection)
+        added = set()
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and (column.nullable or column.server_default is not None):
+                    ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                    added.add((table.name, column.name))
+        # added counters start out at their defaults, so fill them in from the
+        # existing messages and memberships, as the search index is below
+        if any((DBChat.__tablename__, name) in added for name in db_counters.COUNTERS):
+            with Session(bind=connection) as session:
+                db_counters.recompute(session)
+        # create_all skips tables that already exist, so indexes added to the
+        # schema later are created here for existing databases
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+        if connection.dialect.name == "sqlite":
+            install_search_index(connection)
+        connection.commit()
+
+    if settings.db_check_query_plans:
+        check_query_plans(engine)
 
 
 def get_session():
-    with Session(engine) as session:
+    # objects stay loaded after commit so handlers can read them without a
+    # second round trip, matching the async sessions below
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+_T = TypeVar("_T")
+
+async def run_db(session: Session | AsyncSession, fn: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+    """Run a `backend.database` function from an async handler.
+
+    With an async session the function runs on the async engine through
+    `AsyncSession.run_sync`, without leaving the event loop; with a sync
+    session it runs in the threadpool. Either way it receives a sync session
+    as its first argument, so the same database functions serve both modes.
+    """
+
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, session, *args, **kwargs)
+
+def sync_bind(session: Session | AsyncSession) -> Engine:
+    """A sync engine on the session's database, for work done outside of it.
+
+    Such as streaming a response after the request's session is released, or
+    writing from another thread. For an async session this is the application's
+    sync engine: the `sync_engine` face of an async engine can only do IO
+    inside `greenlet_spawn`, i.e. on the event loop, never from a thread.
+    """
+
+    if isinstance(session, AsyncSession):
+        return engine
+    return session.get_bind()
+
+async def release_db(session: Session | AsyncSession):
+    """Close a session early, returning its connection to the pool.
+
+    For long-lived handlers such as WebSockets, which would otherwise hold a
+    pooled connection for as long as the client stays connected.
+    """
+
+    if isinstance(session, AsyncSession):
+        await session.close()
+    else:
+        await run_in_threadpool(session.close)
+
 def get_token(
     cookie_token: str | None = Depends(cookie_scheme),
     bearer: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
@@ -47,8 +127,24 @@ def get_token(
         return bearer.credentials
     raise Forbidden("authentication_required", "Not authenticated")
 
-def get_current_account(
-    session: Session = Depends(get_session),
+# the sync session always exists; handlers doing CPU-bound password work keep
+# using it from the threadpool so bcrypt never runs on the event loop
+SyncDBSession = Annotated[Session, Depends(get_session)]
+
+# the session of every other handler, chosen by `settings.db_async`; a
+# dependency of its own so tests can swap the mode without touching the
+# sync session above
+if settings.db_async:
+    async def get_db_session(session: AsyncSession = Depends(get_async_session)) -> AsyncSession:
+        return session
+else:
+    async def get_db_session(session: Session = Depends(get_session)) -> Session:
+        return session
+
+DBSession = Annotated[Session, Depends(get_db_session)]
+
+async def get_current_account(
+    session: DBSession,
     token: str = Depends(get_token),
 ) -> DBAccount:
     """Current account dependency.
@@ -56,9 +152,44 @@ def get_current_account(
     Depends on the session and the token.
     """
 
-    return db_auth.extract_account(session, token)
+    account = db_auth.get_cached_account(token)
+    if account is not None:
+        return account
+    return await run_db(session, db_auth.extract_account, token)
+
+
+def get_websocket_token(websocket: WebSocket) -> str:
+    """WebSocket token extraction dependency.
+
+    Accepts the same cookie and bearer token as `get_token`. Browsers cannot set
+    headers on WebSocket requests, so a `token` query parameter is accepted too.
+    """
+
+    token = websocket.cookies.get(settings.jwt_cookie_key)
+    if token:
+        return token
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+
+async def get_websocket_account(
+    session: DBSession,
+    token: str = Depends(get_websocket_token),
+) -> DBAccount:
+    """Current account dependency for WebSockets.
+
+    Depends on the session and the WebSocket token.
+    """
 
+    try:
+        return await get_current_account(session, token)
+    except CustomHTTPException as error:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=error.content.message)
 
 
 CurrentAccount = Annotated[DBAccount, Depends(get_current_account)]
-DBSession = Annotated[Session, Depends(get_session)]
\ No newline at end of file
+WebSocketAccount = Annotated[DBAccount, Depends(get_websocket_account)]
\ No newline at end of file
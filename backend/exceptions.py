@@ -119,6 +119,64 @@ class InvalidCredentials(CustomHTTPException):
             content=self.content.model_dump()
         )
 
+class InvalidCursor(CustomHTTPException):
+    def __init__(self, cursor: str):
+        self.content = Error(
+            error="invalid_cursor",
+            message=f"Invalid pagination cursor: {cursor}"
+        )
+        self.status_code = 422
+    
+    def response(self) -> Response:
+        return JSONResponse(
+            status_code=self.status_code,
+            content=self.content.model_dump()
+        )
+
+class InvalidQueryParameter(CustomHTTPException):
+    def __init__(self, name: str, value: str):
+        self.content = Error(
+            error="invalid_query_parameter",
+            message=f"Invalid value for query parameter {name}: {value}"
+        )
+        self.status_code = 422
+    
+    def response(self) -> Response:
+        return JSONResponse(
+            status_code=self.status_code,
+            content=self.content.model_dump()
+        )
+
+class InvalidRequestBody(CustomHTTPException):
+    def __init__(self, message: str):
+        self.content = Error(
+            error="invalid_request_body",
+            message=message
+        )
+        self.status_code = 422
+    
+    def response(self) -> Response:
+        return JSONResponse(
+            status_code=self.status_code,
+            content=self.content.model_dump()
+        )
+
+class ServiceUnavailable(CustomHTTPException):
+    def __init__(self, error: str, message: str, retry_after: int = 1):
+        self.content = Error(
+            error=error,
+            message=message
+        )
+        self.status_code = 503
+        self.retry_after = retry_after
+    
+    def response(self) -> Response:
+        return JSONResponse(
+            status_code=self.status_code,
+            content=self.content.model_dump(),
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
 def authentication_required():
     return Forbidden("authentication_required", "Not authenticated")
 
@@ -0,0 +1,98 @@
+"""Background workers running the jobs queued in `backend.database.jobs`.
+
+`start_workers` is called from the application's lifespan. Each worker is an
+asyncio task that claims one job at a time and runs it in the threadpool with a
+session of its own, so the event loop keeps serving requests meanwhile. Idle
+workers poll the queue every `settings.jobs_poll_interval` seconds, and are woken
+right away by `notify` when this process queues a job.
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.config import settings
+from backend.database import jobs as db_jobs
+
+logger = logging.getLogger(__name__)
+
+_loop: asyncio.AbstractEventLoop | None = None
+_wakeup: asyncio.Event | None = None
+
+
+def _run_next(engine: Engine) -> bool:
+    with Session(engine, expire_on_commit=False) as session:
+        job = db_jobs.claim_next(session)
+        if job is None:
+            return False
+        logger.info("running job %s (%s)", job.id, job.kind)
+        db_jobs.run(session, job)
+        if job.status == db_jobs.FAILED:
+            logger.warning("job %s (%s) failed: %s", job.id, job.kind, job.error)
+        return True
+
+
+async def _work(engine: Engine, wakeup: asyncio.Event):
+    while True:
+        try:
+            ran = await run_in_threadpool(_run_next, engine)
+        except Exception:
+            logger.exception("job worker error")
+            ran = False
+        if not ran:
+            try:
+                await asyncio.wait_for(wakeup.wait(), settings.jobs_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+
+
+def notify():
+    """Wake idle workers after queueing a job; safe to call from any thread."""
+
+    loop, wakeup = _loop, _wakeup
+    if loop is None or wakeup is None:
+        return
+    try:
+        loop.call_soon_threadsafe(wakeup.set)
+    except RuntimeError:
+        # the loop has shut down; the job waits for the next start
+        pass
+
+
+def start_workers(engine: Engine) -> list[asyncio.Task]:
+    """Requeue jobs orphaned by a previous run and start the workers.
+
+    Args:
+        engine (Engine): The database engine the workers use
+
+    Returns:
+        list[asyncio.Task]: The worker tasks, to pass to `stop_workers`
+    """
+
+    global _loop, _wakeup
+    with Session(engine) as session:
+        requeued = db_jobs.requeue_stale(session)
+    if requeued:
+        logger.info("requeued %s stale jobs", requeued)
+
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    return [asyncio.create_task(_work(engine, _wakeup)) for _ in range(settings.jobs_workers)]
+
+
+async def stop_workers(workers: list[asyncio.Task]):
+    """Cancel the workers.
+
+    A job cut short stays running until `settings.jobs_stale_after` has passed,
+    then the next start requeues it.
+    """
+
+    global _loop, _wakeup
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    _loop = _wakeup = None
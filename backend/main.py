@@ -8,24 +8,34 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
-from backend.dependencies import create_db_tables
+from backend import jobs, metrics
+from backend.batching import message_batcher
+from backend.config import settings
+from backend.database.profiling import QueryStatsMiddleware
+from backend.dependencies import create_db_tables, engine
 from backend.routers.accounts import accounts_router
 from backend.routers.chats import chats_router
 from backend.routers.auth import auth_router
+from backend.routers.jobs import jobs_router
 from backend.exceptions import CustomHTTPException
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_tables()
+    workers = jobs.start_workers(engine)
     yield
+    await jobs.stop_workers(workers)
+    message_batcher.close()
 
 
 app = FastAPI(
     title="Pony Express",
     summary="a messaging application",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -36,14 +46,27 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-for router in [accounts_router, chats_router, auth_router]:
+for router in [accounts_router, chats_router, auth_router, jobs_router]:
     app.include_router(router)
 
+# ========== middleware ==========
+if settings.db_query_stats or settings.db_slow_query_threshold is not None:
+    app.add_middleware(QueryStatsMiddleware)
+
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # ========== router ==========
+# async so that health checks never wait for a threadpool slot
 @app.get("/status", response_model=None, status_code=204)
-def status():
+async def status():
     pass
 
+if settings.metrics_enabled:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def get_metrics():
+        return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 # ========== exception handlers ==========
 @app.exception_handler(CustomHTTPException)
 def handle_exceptions(request: Request, exception: CustomHTTPException):
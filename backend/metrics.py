@@ -0,0 +1,201 @@
+"""Application metrics, exported in the Prometheus text format from `/metrics`.
+
+`MetricsMiddleware` records request counts, latencies and in-flight requests per
+route template (e.g. `/chats/{chat_id}/messages`, never the raw path, so the
+number of series stays bounded). The engines' pools record how long checkouts
+wait for a connection (see `backend.database.engine`), and the password queue
+depth is read from `backend.utils` when scraped.
+
+Updates are a dictionary lookup and a few additions under an uncontended
+per-metric lock; rendering copies the values under the same lock.
+"""
+
+import threading
+import time
+from typing import Callable, Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend import utils
+
+# seconds; Prometheus' default buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A total that only goes up."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, or is read from `function` when scraped."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, function: Callable[[], float] | None = None):
+        super().__init__(name, help)
+        self.function = function
+        self._value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def samples(self) -> list[str]:
+        value = self.function() if self.function else self._value
+        return [f"{self.name} {_number(value)}"]
+
+
+class Histogram(_Metric):
+    """Observations counted in cumulative buckets, with their sum."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: a count per bucket, then the +Inf count, then the sum
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        lines = []
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), values):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(values[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_number(cumulative)}")
+        return lines
+
+
+class Registry:
+    """The metrics exported together."""
+
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+registry = Registry()
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"),
+))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to complete HTTP requests, body included.", ("method", "route"),
+))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests being served.",
+))
+pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection.",
+    buckets=POOL_WAIT_BUCKETS,
+))
+password_queue_depth = registry.register(Gauge(
+    "password_queue_depth", "Password hashing tasks waiting for a worker.", utils.password_queue_depth,
+))
+
+
+class MetricsMiddleware:
+    """Record every HTTP request in the request metrics."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            requests_in_flight.dec()
+            # the router stores the matched route in the scope
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            requests_total.inc(scope["method"], path, str(status))
+            request_duration.observe(duration, scope["method"], path)
@@ -1,3 +1,5 @@
+import base64
+import binascii
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
@@ -14,6 +16,35 @@ class Message(BaseModel):
     chat_id: int 
     created_at: datetime | None
 
+class MessageCursor(BaseModel):
+    """Keyset position of a message within a chat, ordered by (created_at, id)."""
+
+    created_at: datetime
+    id: int
+
+    @classmethod
+    def from_message(cls, message) -> "MessageCursor":
+        return cls(created_at=message.created_at, id=message.id)
+
+    def encode(self) -> str:
+        raw = f"{self.created_at.isoformat()}|{self.id}".encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    @classmethod
+    def decode(cls, cursor: str) -> "MessageCursor":
+        """Decode an opaque cursor string.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+            created_at, message_id = raw.rsplit("|", 1)
+            return cls(created_at=datetime.fromisoformat(created_at), id=int(message_id))
+        except (binascii.Error, UnicodeError, ValueError) as error:
+            raise ValueError(f"invalid cursor: {cursor}") from error
+
 class ChatMembership(BaseModel):
     account_id: int
     chat_id: int
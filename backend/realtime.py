@@ -0,0 +1,151 @@
+"""In-process pub/sub hub for real-time chat events.
+
+Handlers publish message events for a chat and every WebSocket subscribed to
+that chat receives them. Each subscriber has a bounded queue: a client that
+cannot keep up is evicted instead of making the hub buffer without limit.
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+
+from backend.config import settings
+
+Event = dict[str, Any]
+
+# sentinel queued in place of pending events when a subscriber is evicted
+_EVICTED = object()
+
+
+class SlowConsumer(Exception):
+    """Raised to a subscriber whose send queue overflowed."""
+
+
+class Subscription:
+    """A subscriber's queue of pending events for one chat."""
+
+    def __init__(self, hub: "ChatHub", chat_id: int, maxsize: int):
+        self.hub = hub
+        self.chat_id = chat_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize)
+        self.evicted = False
+
+    def deliver(self, event: str):
+        # always runs on the subscriber's event loop
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.evicted = True
+            self.hub.unsubscribe(self)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_EVICTED)
+
+    async def get(self) -> str:
+        """Wait for the next serialized event.
+
+        Raises:
+            SlowConsumer: If the subscriber was evicted for falling behind
+        """
+
+        event = await self.queue.get()
+        if event is _EVICTED:
+            raise SlowConsumer()
+        return event
+
+
+class ChatHub:
+    """Fan-out of chat events to subscribers in this process."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, chat_id: int) -> Subscription:
+        """Subscribe to the events of a chat; must be called from the subscriber's event loop."""
+
+        subscription = Subscription(self, chat_id, self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(chat_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.chat_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.chat_id]
+
+    def subscriber_count(self, chat_id: int) -> int:
+        with self._lock:
+            return len(self._subscriptions.get(chat_id, ()))
+
+    def publish(self, chat_id: int, event: Event):
+        """Send an event to every subscriber of a chat without blocking.
+
+        The event is serialized once, however many subscribers receive it.
+        Safe to call from any thread or event loop.
+        """
+
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(chat_id, ()))
+        if not subscriptions:
+            return
+        event = json.dumps(jsonable_encoder(event))
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        for subscription in subscriptions:
+            if subscription.loop is current_loop:
+                subscription.deliver(event)
+            else:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+                except RuntimeError:
+                    # the subscriber's loop has shut down
+                    self.unsubscribe(subscription)
+
+
+async def forward_events(websocket: WebSocket, subscription: Subscription):
+    """Send a subscription's events to an accepted WebSocket until either side stops.
+
+    A subscriber evicted for falling behind is closed with code 1013 (try again
+    later), so the client can reconnect and catch up.
+    """
+
+    async def send():
+        while True:
+            await websocket.send_text(await subscription.get())
+
+    async def receive():
+        # clients only listen, but reading is how a disconnect is noticed
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender = asyncio.create_task(send())
+    receiver = asyncio.create_task(receive())
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (sender, receiver):
+            task.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+
+    if sender.done() and not sender.cancelled() and isinstance(sender.exception(), SlowConsumer):
+        try:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Slow consumer")
+        except (RuntimeError, WebSocketDisconnect):
+            pass
+
+
+hub = ChatHub(settings.ws_send_queue_size)
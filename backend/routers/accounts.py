@@ -1,26 +1,38 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, Form
+from fastapi import APIRouter, Depends, Form, Response
+from fastapi.responses import ORJSONResponse
 
-from backend.dependencies import CurrentAccount, DBSession, get_current_account
-from backend.exceptions import EntityNotFound
+from backend.config import settings
+from backend.dependencies import CurrentAccount, DBSession, SyncDBSession, get_current_account, run_db
+from backend.exceptions import EntityNotFound, InvalidQueryParameter
 from backend.database import accounts as db_accounts
+from backend.database import chats as db_chats
+from backend.database import jobs as db_jobs
 from backend.models.accounts import AccountUpdate, UpdatePassword
+from backend.routers.jobs import accepted
 
 accounts_router = APIRouter(prefix="/accounts", tags=["Accounts"])
 
 @accounts_router.get("/")
-def get_accounts(session: DBSession):
-    accounts = db_accounts.get_all(session)
+async def get_accounts(session: DBSession, ids: str | None = None):
+    if ids is None:
+        accounts = await run_db(session, db_accounts.get_all)
+    else:
+        try:
+            account_ids = [int(account_id) for account_id in ids.split(",")]
+        except ValueError:
+            raise InvalidQueryParameter("ids", ids)
+        if len(account_ids) > settings.accounts_batch_max:
+            raise InvalidQueryParameter("ids", ids)
+        accounts = await run_db(session, db_accounts.get_by_ids, account_ids)
 
-    response = {
+    return ORJSONResponse({
         "metadata": {"count": len(accounts)},
-        "accounts":  [{"id": account.id, "username": account.username} for account in accounts]
-    }
-    
-    return response
+        "accounts": [account._asdict() for account in accounts],
+    })
 
 @accounts_router.get("/me", status_code=200)
-def get_self(account: CurrentAccount):
+async def get_self(account: CurrentAccount):
     
     return {
         "id": account.id,
@@ -29,9 +41,40 @@ def get_self(account: CurrentAccount):
     }
     
 
+@accounts_router.get("/me/chats")
+async def get_own_chats(session: DBSession, account: CurrentAccount):
+    inbox = await run_db(session, db_chats.get_inbox, account.id)
+
+    response = {
+        "metadata": {"count": len(inbox)},
+        "chats": [
+            {
+                "id": chat.id,
+                "name": chat.name,
+                "owner_id": chat.owner_id,
+                "message_count": chat.message_count,
+                "member_count": chat.member_count,
+                "unread_count": unread_count,
+                "last_message": None if message is None else {
+                    "id": message.id,
+                    "text": message.text,
+                    "account_id": message.account_id,
+                    "created_at": message.created_at,
+                },
+            }
+            for chat, message, unread_count in inbox
+        ]
+    }
+    return response
+
+@accounts_router.put("/me/chats/{chat_id}/read", status_code=200)
+async def mark_chat_read(session: DBSession, account: CurrentAccount, chat_id: int, message_id: int | None = None):
+    membership = await run_db(session, db_chats.mark_read, chat_id, account.id, message_id)
+    return {"chat_id": membership.chat_id, "last_read_message_id": membership.last_read_message_id}
+
 @accounts_router.put("/me", status_code=200)
-def update_self(session: DBSession, updated_account: AccountUpdate, account: CurrentAccount):
-    db_accounts.update_account(session, account.id, updated_account)
+async def update_self(session: DBSession, updated_account: AccountUpdate, account: CurrentAccount):
+    account = await run_db(session, db_accounts.update_account, account.id, updated_account)
     return {
         "id": account.id,
         "username": account.username,
@@ -40,17 +83,18 @@ def update_self(session: DBSession, updated_account: AccountUpdate, account: Cur
     
 
 @accounts_router.put("/me/password", status_code=204)
-def new_password(session: DBSession, account: CurrentAccount, form: Annotated[UpdatePassword, Form()]):
+def new_password(session: SyncDBSession, account: CurrentAccount, form: Annotated[UpdatePassword, Form()]):
     db_accounts.update_password(session, account, form.old_password, form.new_password)
     
 
-@accounts_router.delete("/me", status_code=204)
-def delete_me(account: CurrentAccount, session: DBSession):
-    db_accounts.delete_account(session, account.id)
+@accounts_router.delete("/me", status_code=202)
+async def delete_me(response: Response, account: CurrentAccount, session: DBSession):
+    job = await run_db(session, db_jobs.enqueue_account_deletion, account.id)
+    return accepted(response, job)
 
 @accounts_router.get("/{account_id}")
-def get_account(session: DBSession, account_id: int):
-    account = db_accounts.get_by_id(session, account_id)
+async def get_account(session: DBSession, account_id: int):
+    account = await run_db(session, db_accounts.get_by_id, account_id)
     if account is not None:
         return {"id": account.id, "username": account.username}
     
@@ -3,7 +3,7 @@ from typing import Annotated
 from sqlmodel import Session
 
 from backend.database.schema import DBAccount
-from backend.dependencies import  DBSession, get_current_account
+from backend.dependencies import  SyncDBSession, get_current_account
 from backend.models.auth import Login, Registration, User
 from backend.database import auth as db_auth
 
@@ -11,7 +11,7 @@ from backend.database import auth as db_auth
 auth_router = APIRouter(prefix="/auth", tags=["Auth"])
 
 @auth_router.post("/registration", status_code=201)
-def register_new_user(session: DBSession, form: Annotated[Registration, Form()]) -> User:
+def register_new_user(session: SyncDBSession, form: Annotated[Registration, Form()]) -> User:
     registered_user = db_auth.create_user(session, form)
 
     return {
@@ -21,7 +21,7 @@ def register_new_user(session: DBSession, form: Annotated[Registration, Form()])
     }
 
 @auth_router.post("/token", status_code=200)
-def get_token(session: DBSession, form: Annotated[Login, Form()]):
+def get_token(session: SyncDBSession, form: Annotated[Login, Form()]):
     access_token = db_auth.get_access_token(session, form)
 
     return {
@@ -30,7 +30,7 @@ def get_token(session: DBSession, form: Annotated[Login, Form()]):
     }
 
 @auth_router.post("/web/login", status_code=204)
-def login(session: DBSession, form: Annotated[Login, Form()], response: Response):
+def login(session: SyncDBSession, form: Annotated[Login, Form()], response: Response):
     access_token = db_auth.get_access_token(session, form)
 
     response.set_cookie(
@@ -49,7 +49,7 @@ def login(session: DBSession, form: Annotated[Login, Form()], response: Response
         "/web/logout", 
         status_code=204,
         dependencies=[Depends(get_current_account)])
-def logout(response: Response):
+async def logout(response: Response):
     response.delete_cookie(key=db_auth.JWT_COOKIE_KEY)
     
 
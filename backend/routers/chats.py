@@ -1,24 +1,39 @@
-from fastapi import APIRouter, Response
+import json
+import zlib
+from typing import Annotated, Iterator, Literal
 
-from backend.dependencies import  CurrentAccount, DBSession
+from fastapi import APIRouter, Query, Request, Response, WebSocket, WebSocketException, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from backend.batching import message_batcher
+from backend.config import settings
+from backend.dependencies import  CurrentAccount, DBSession, WebSocketAccount, release_db, run_db, sync_bind
 from backend.database import chats as db_chats
+from backend.database import jobs as db_jobs
+from backend.database import search as db_search
+from backend.exceptions import CustomHTTPException, InvalidCursor, InvalidQueryParameter, InvalidRequestBody
 from backend.models import chats as model_chats
+from backend.realtime import forward_events, hub
+from backend.routers.jobs import accepted
 
 chats_router = APIRouter(prefix="/chats", tags=["Chats"])
 
 @chats_router.get("/")
-def get_chats(session: DBSession):
-    chats = db_chats.get_all(session)
+async def get_chats(session: DBSession):
+    chats = await run_db(session, db_chats.get_all)
 
-    response = {
+    # rows go straight to orjson, skipping FastAPI's jsonable_encoder pass
+    return ORJSONResponse({
         "metadata": {"count": len(chats)},
-        "chats": [{"id": chat.id, "name": chat.name, "owner_id": chat.owner_id} for chat in chats]
-    }
-    return response
+        "chats": [chat._asdict() for chat in chats],
+    })
 
 @chats_router.post("/", status_code=201)
-def put_chats(session: DBSession, chat: model_chats.ChatCreate, account: CurrentAccount):
-    new_chat = db_chats.create_chat(session, chat, account.id)
+async def put_chats(session: DBSession, chat: model_chats.ChatCreate, account: CurrentAccount):
+    new_chat = await run_db(session, db_chats.create_chat, chat, account.id)
 
     return {
         "id": new_chat.id,
@@ -26,14 +41,43 @@ def put_chats(session: DBSession, chat: model_chats.ChatCreate, account: Current
         "owner_id": new_chat.owner_id
     }
 
+def _search_response(results: list, has_more: bool, offset: int) -> dict:
+    return {
+        "metadata": {"count": len(results), "offset": offset, "has_more": has_more},
+        "messages": [
+            {"id": message.id, "text": message.text, "account_id": message.account_id, "chat_id": message.chat_id, "created_at": message.created_at, "snippet": snippet}
+            for message, snippet in results
+        ]
+    }
+
+def _match_expression(q: str) -> str:
+    match = db_search.match_expression(q)
+    if match is None:
+        raise InvalidQueryParameter("q", q)
+    return match
+
+# declared before /{chat_id} so that "search" is not taken for a chat id
+@chats_router.get("/search")
+async def search_messages(
+    session: DBSession,
+    account: CurrentAccount,
+    q: str,
+    limit: Annotated[int, Query(ge=1, le=settings.search_page_size_max)] = settings.search_page_size,
+    offset: Annotated[int, Query(ge=0)] = 0,
+):
+    match = _match_expression(q)
+    results, has_more = await run_db(session, db_search.search_messages, match, limit, offset, account_id=account.id)
+
+    return _search_response(results, has_more, offset)
+
 @chats_router.get("/{chat_id}")
-def get_chat(session: DBSession, chat_id: int):
-    chat = db_chats.get_by_id(session, chat_id)
+async def get_chat(session: DBSession, chat_id: int):
+    chat = await run_db(session, db_chats.get_by_id, chat_id)
     return {"id": chat.id, "name": chat.name, "owner_id": chat.owner_id}
 
 @chats_router.put("/{chat_id}", status_code=200)
-def update_chat(session: DBSession, chat_id: int, chat: model_chats.ChatUpdate):
-    updated_chat = db_chats.update_chat(session, chat_id, chat)
+async def update_chat(session: DBSession, chat_id: int, chat: model_chats.ChatUpdate):
+    updated_chat = await run_db(session, db_chats.update_chat, chat_id, chat)
 
     return {
         "id": updated_chat.id,
@@ -41,70 +85,245 @@ def update_chat(session: DBSession, chat_id: int, chat: model_chats.ChatUpdate):
         "owner_id": updated_chat.owner_id
     }
 
-@chats_router.delete("/{chat_id}", status_code=204)
-def delete_chat(session: DBSession, chat_id: int):
-    db_chats.delete_chat(session, chat_id)
+@chats_router.delete("/{chat_id}", status_code=202)
+async def delete_chat(response: Response, session: DBSession, chat_id: int):
+    job = await run_db(session, db_jobs.enqueue_chat_deletion, chat_id)
+    return accepted(response, job)
 
 @chats_router.get("/{chat_id}/accounts")
-def get_chat_accounts(session: DBSession, chat_id: int):
-    accounts = db_chats.get_accounts_for_chat(session, chat_id)
+async def get_chat_accounts(session: DBSession, chat_id: int):
+    accounts = await run_db(session, db_chats.get_accounts_for_chat, chat_id)
 
-    response = {
+    return ORJSONResponse({
         "metadata": {"count": len(accounts)},
-        "accounts":  [{"id": account.id, "username": account.username} for account in accounts]
-    }
-    
-    return response
+        "accounts": [account._asdict() for account in accounts],
+    })
+
+def _decode_cursor(cursor: str | None) -> model_chats.MessageCursor | None:
+    if cursor is None:
+        return None
+    try:
+        return model_chats.MessageCursor.decode(cursor)
+    except ValueError:
+        raise InvalidCursor(cursor)
 
 @chats_router.get("/{chat_id}/messages") 
-def get_chat_messages(session: DBSession, chat_id: int):
-    messages = db_chats.get_messages_for_chat(session, chat_id)
+async def get_chat_messages(
+    session: DBSession,
+    chat_id: int,
+    before: str | None = None,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=settings.messages_page_size_max)] = settings.messages_page_size,
+    expand: Literal["authors"] | None = None,
+):
+    before_cursor = _decode_cursor(before)
+    after_cursor = _decode_cursor(after)
+    if expand == "authors":
+        messages, has_more = await run_db(session, db_chats.get_messages_page_with_authors, chat_id, limit, before=before_cursor, after=after_cursor)
+    else:
+        messages, has_more = await run_db(session, db_chats.get_messages_page, chat_id, limit, before=before_cursor, after=after_cursor)
+
+    # older messages exist when reading backwards ran out of room, or when reading
+    # forwards from a cursor; newer ones exist in the mirrored cases
+    first = model_chats.MessageCursor.from_message(messages[0]).encode() if messages else None
+    last = model_chats.MessageCursor.from_message(messages[-1]).encode() if messages else None
+    if after_cursor is not None:
+        prev_cursor = first or after
+        next_cursor = (last or before) if has_more or before_cursor is not None else None
+    else:
+        prev_cursor = first if has_more else None
+        next_cursor = (last or before) if before_cursor is not None else None
+
+    return ORJSONResponse({
+        "metadata": {"count": len(messages), "prev_cursor": prev_cursor, "next_cursor": next_cursor},
+        "messages": [message._asdict() for message in messages],
+    })
+
+def _export_lines(bind: Engine, chat_id: int, after: model_chats.MessageCursor | None, compress: bool) -> Iterator[bytes]:
+    # runs in the threadpool as the response is sent, on a session of its own:
+    # the request's session is released before streaming starts
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    with Session(bind) as session:
+        lines = []
+        for row in db_chats.iter_messages(session, chat_id, after, settings.messages_export_batch_size):
+            message = row._asdict()
+            message["created_at"] = message["created_at"].isoformat()
+            message["cursor"] = model_chats.MessageCursor(created_at=row.created_at, id=row.id).encode()
+            lines.append(json.dumps(message).encode() + b"\n")
+            if len(lines) == settings.messages_export_batch_size:
+                chunk, lines = b"".join(lines), []
+                yield compressor.compress(chunk) if compressor else chunk
+    chunk = b"".join(lines)
+    yield compressor.compress(chunk) + compressor.flush() if compressor else chunk
+
+@chats_router.get("/{chat_id}/messages/export")
+async def export_chat_messages(session: DBSession, chat_id: int, after: str | None = None, gzip: bool = False):
+    after_cursor = _decode_cursor(after)
+    await run_db(session, db_chats.get_by_id, chat_id)
+    bind = sync_bind(session)
+    await release_db(session)
+
+    filename = f"chat-{chat_id}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        _export_lines(bind, chat_id, after_cursor, gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@chats_router.get("/{chat_id}/messages/search")
+async def search_chat_messages(
+    session: DBSession,
+    chat_id: int,
+    q: str,
+    limit: Annotated[int, Query(ge=1, le=settings.search_page_size_max)] = settings.search_page_size,
+    offset: Annotated[int, Query(ge=0)] = 0,
+):
+    match = _match_expression(q)
+    results, has_more = await run_db(session, db_chats.search_chat_messages, chat_id, match, limit, offset)
+
+    return _search_response(results, has_more, offset)
+
+@chats_router.get("/{chat_id}/messages/changes")
+async def get_chat_message_changes(
+    session: DBSession,
+    chat_id: int,
+    since: Annotated[int | None, Query(ge=0)] = None,
+    limit: Annotated[int, Query(ge=1, le=settings.messages_page_size_max)] = settings.messages_page_size_max,
+):
+    changes, cursor, has_more = await run_db(session, db_chats.get_message_changes, chat_id, since, limit)
 
     response = {
-        "metadata": {"count": len(messages)},
-        "messages": [{"id": message.id, "text": message.text, "account_id": message.account_id, "chat_id": message.chat_id, "created_at": message.created_at} for message in messages]
+        "metadata": {"count": len(changes), "cursor": cursor, "has_more": has_more},
+        "changes": [
+            {
+                "seq": change.seq,
+                "type": change.kind,
+                "message_id": change.message_id,
+                "message": None if message is None else {"id": message.id, "text": message.text, "account_id": message.account_id, "chat_id": message.chat_id, "created_at": message.created_at},
+            }
+            for change, message in changes
+        ]
     }
 
     return response
 
 @chats_router.post("/{chat_id}/messages", status_code=201)
-def post_chat_messages(session: DBSession, chat_id: int, message: model_chats.MessageCreate, account: CurrentAccount):
-    new_message = db_chats.add_message(session, chat_id, message, account.id)
+async def post_chat_messages(session: DBSession, chat_id: int, message: model_chats.MessageCreate, account: CurrentAccount):
+    if settings.db_write_batching:
+        new_message = await message_batcher.add_message(session, chat_id, message, account.id)
+    else:
+        new_message = await run_db(session, db_chats.add_message, chat_id, message, account.id)
 
-    return {
+    response = {
         "id": new_message.id,
         "text": new_message.text,
         "chat_id": new_message.chat_id,
         "created_at": new_message.created_at,
         "account_id": account.id
     }
+    hub.publish(chat_id, {"type": "message_created", "message": response})
 
-@chats_router.put("/{chat_id}/messages/{message_id}", status_code=200)
-def add_message(session: DBSession, chat_id: int, message_id: int, message: model_chats.MessageUpdate):
-    updated_message = db_chats.update_message(session, chat_id, message_id, message)
+    return response
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+async def _read_bulk_items(request: Request) -> list:
+    """Read a JSON array, or NDJSON streamed line by line, from the request body."""
+
+    if request.headers.get("content-type", "").split(";")[0].strip() not in NDJSON_TYPES:
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            raise InvalidRequestBody("Expected a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise InvalidRequestBody("Expected a JSON array or NDJSON")
+        if len(items) > settings.messages_bulk_max:
+            raise InvalidRequestBody(f"Expected at most {settings.messages_bulk_max} messages")
+        return items
+
+    items, buffer = [], b""
+    async for data in request.stream():
+        *lines, buffer = (buffer + data).split(b"\n")
+        for line in lines:
+            if line.strip():
+                items.append(line)
+        if len(items) > settings.messages_bulk_max:
+            raise InvalidRequestBody(f"Expected at most {settings.messages_bulk_max} messages")
+    if buffer.strip():
+        items.append(buffer)
+    if len(items) > settings.messages_bulk_max:
+        raise InvalidRequestBody(f"Expected at most {settings.messages_bulk_max} messages")
+    return items
+
+@chats_router.post("/{chat_id}/messages/bulk", status_code=200)
+async def post_chat_messages_bulk(request: Request, session: DBSession, chat_id: int, account: CurrentAccount):
+    results: list = []
+    messages, indexes = [], []
+    for index, item in enumerate(await _read_bulk_items(request)):
+        try:
+            if isinstance(item, bytes):
+                messages.append(model_chats.MessageCreate.model_validate_json(item))
+            else:
+                messages.append(model_chats.MessageCreate.model_validate(item))
+        except ValidationError as error:
+            reason = "; ".join(f"{'.'.join(map(str, detail['loc'])) or 'message'}: {detail['msg']}" for detail in error.errors())
+            results.append({"index": index, "status": 422, "error": "invalid_message", "message": reason})
+        else:
+            results.append(None)
+            indexes.append(index)
+
+    created = 0
+    outcomes = await run_db(session, db_chats.add_messages, chat_id, messages, account.id)
+    for index, outcome in zip(indexes, outcomes):
+        if isinstance(outcome, CustomHTTPException):
+            results[index] = {"index": index, "status": outcome.status_code, **outcome.content.model_dump()}
+            continue
+        message = {
+            "id": outcome.id,
+            "text": outcome.text,
+            "chat_id": outcome.chat_id,
+            "created_at": outcome.created_at,
+            "account_id": outcome.account_id,
+        }
+        results[index] = {"index": index, "status": 201, "message": message}
+        hub.publish(chat_id, {"type": "message_created", "message": message})
+        created += 1
 
     return {
+        "metadata": {"count": len(results), "created": created, "failed": len(results) - created},
+        "results": results,
+    }
+
+@chats_router.put("/{chat_id}/messages/{message_id}", status_code=200)
+async def add_message(session: DBSession, chat_id: int, message_id: int, message: model_chats.MessageUpdate):
+    updated_message = await run_db(session, db_chats.update_message, chat_id, message_id, message)
+
+    response = {
         "id": updated_message.id,
         "text": updated_message.text,
         "chat_id": updated_message.chat_id,
         "created_at": updated_message.created_at,
-        "account_id": updated_message.id
+        "account_id": updated_message.account_id
     }
+    hub.publish(chat_id, {"type": "message_updated", "message": response})
+
+    return response
 
 @chats_router.delete("/{chat_id}/messages/{message_id}", status_code=204)
-def delete_message(session: DBSession, chat_id: int, message_id: int):
-    db_chats.delete_message(session=session, chat_id=chat_id, message_id=message_id)
+async def delete_message(session: DBSession, chat_id: int, message_id: int):
+    await run_db(session, db_chats.delete_message, chat_id=chat_id, message_id=message_id)
+    hub.publish(chat_id, {"type": "message_deleted", "message": {"id": message_id, "chat_id": chat_id}})
 
 @chats_router.post("/{chat_id}/accounts", status_code=200)
-def add_account_to_chat(response: Response, session: DBSession, chat_id: int, chat_membership: model_chats.ChatMembershipCreate):
-    existing_membership = db_chats.get_membership_by_ids(session, chat_id, chat_membership.account_id)
+async def add_account_to_chat(response: Response, session: DBSession, chat_id: int, chat_membership: model_chats.ChatMembershipCreate):
+    existing_membership = await run_db(session, db_chats.get_membership_by_ids, chat_id, chat_membership.account_id)
     if existing_membership:
         return {
             "chat_id": existing_membership.chat_id,
             "account_id": existing_membership.account_id
         }
     
-    new_membership = db_chats.add_membership(session=session, chat_id=chat_id, chat_membership=chat_membership)
+    new_membership = await run_db(session, db_chats.add_membership, chat_id=chat_id, chat_membership=chat_membership)
     response.status_code = 201
 
     return {
@@ -113,5 +332,21 @@ def add_account_to_chat(response: Response, session: DBSession, chat_id: int, ch
     }
 
 @chats_router.delete("/{chat_id}/accounts/{account_id}", status_code=204)
-def remove_account_from_chat(session: DBSession, chat_id: int, account_id: int):
-    db_chats.delete_membership(session, chat_id, account_id)
\ No newline at end of file
+async def remove_account_from_chat(session: DBSession, chat_id: int, account_id: int):
+    await run_db(session, db_chats.delete_membership, chat_id, account_id)
+
+@chats_router.websocket("/{chat_id}/ws")
+async def chat_events(websocket: WebSocket, session: DBSession, chat_id: int, account: WebSocketAccount):
+    if not await run_db(session, db_chats.is_member, chat_id, account.id):
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason=f"Account with id={account.id} must be a member of chat with id={chat_id}",
+        )
+    await release_db(session)
+
+    subscription = hub.subscribe(chat_id)
+    try:
+        await websocket.accept()
+        await forward_events(websocket, subscription)
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Response
+
+from backend.database import jobs as db_jobs
+from backend.database.schema import DBJob
+from backend.dependencies import DBSession, run_db
+from backend import jobs
+
+jobs_router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+def job_response(job: DBJob) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+def accepted(response: Response, job: DBJob) -> dict:
+    """Answer a request whose work was queued as a job, with 202 Accepted."""
+
+    jobs.notify()
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job_response(job)
+
+@jobs_router.get("/{job_id}")
+async def get_job(session: DBSession, job_id: int):
+    job = await run_db(session, db_jobs.get_by_id, job_id)
+    return job_response(job)
@@ -1,9 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
-def _hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
+from backend.config import settings
+from backend.exceptions import ServiceUnavailable
+
+# bcrypt is deliberately slow, so password work runs on its own small pool
+# instead of the request threadpool; once every worker is busy and the queue is
+# full, further requests are refused instead of piling up behind them
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_workers,
+    thread_name_prefix="password",
+)
+_password_slots = threading.BoundedSemaphore(settings.password_workers + settings.password_queue_depth)
+# tasks submitted but not yet picked up by a worker, for the metrics
+_password_waiting = 0
+_password_waiting_lock = threading.Lock()
+
+def password_queue_depth() -> int:
+    """The number of password tasks waiting for a worker."""
+
+    return _password_waiting
+
+def _count_waiting(amount: int):
+    global _password_waiting
+    with _password_waiting_lock:
+        _password_waiting += amount
+
+def _started(fn, *args):
+    _count_waiting(-1)
+    return fn(*args)
+
+def _run_password_task(fn, *args):
+    if not _password_slots.acquire(blocking=False):
+        raise ServiceUnavailable("password_queue_full", "Too many concurrent authentication attempts, try again later")
+    _count_waiting(1)
+    try:
+        future = _password_executor.submit(_started, fn, *args)
+    except BaseException:
+        _count_waiting(-1)
+        _password_slots.release()
+        raise
+    future.add_done_callback(lambda _: _password_slots.release())
+    return future.result()
+
+def _hashpw(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
     hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed_password.decode('utf-8') 
 
-def _verify_password(plain_password: str, hashed_password: str) -> bool:
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def _hash_password(password: str) -> str:
+    return _run_password_task(_hashpw, password)
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _run_password_task(_checkpw, plain_password, hashed_password)
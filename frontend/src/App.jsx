@@ -101,9 +101,11 @@ ChatItem.propTypes = {
 
 
 function Messages({chatId}) {
-  const { messages } = useChatMessages(chatId);
+  const { messages, loadOlder, hasOlder, loadingOlder } = useChatMessages(chatId);
   const [scrollValue, setScrollValue] = useState(0);
   const listRef = useRef(null);
+  // the scroll height before older messages were prepended, to keep the view in place
+  const previousHeight = useRef(null);
 
   useEffect(() => {
       // update scrollValue anytime listRef.current is scrolled
@@ -120,15 +122,44 @@ function Messages({chatId}) {
     });
   };
 
+  const showOlder = () => {
+    if (!hasOlder || loadingOlder)
+      return;
+    previousHeight.current = listRef.current.scrollHeight;
+    loadOlder();
+  };
+
+  // reaching the top of the list loads the page before it
+  useEffect(() => {
+    if (scrollValue === 0)
+      showOlder();
+  }, [scrollValue]);
+
+  const newestId = messages.length ? messages[messages.length - 1].id : null;
+
   useEffect(() => {
     if (listRef.current) {
       scrollToBottom();
     }
-  }, [messages]);
+  }, [newestId]);
+
+  useEffect(() => {
+    if (listRef.current && previousHeight.current !== null && !loadingOlder) {
+      listRef.current.scrollTop = listRef.current.scrollHeight - previousHeight.current;
+      previousHeight.current = null;
+    }
+  }, [messages, loadingOlder]);
 
   return (
     <div className="flex flex-col justify-between">
     <ul ref={listRef} className="h-[calc(100lvh-256px)] max-h-160 min-h-full overflow-y-scroll">
+      {hasOlder && (
+        <li className="text-center">
+          <button type="button" onClick={showOlder} disabled={loadingOlder} className="text-blue-500 hover:text-blue-200 px-2 py-1">
+            {loadingOlder ? "Loading..." : "Load older messages"}
+          </button>
+        </li>
+      )}
       {messages.map((message) => (
         <Message key={message.id} text={message.text} account_id={message.account_id} created_at={message.created_at}/>
       ))}
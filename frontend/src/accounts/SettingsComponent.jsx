@@ -92,7 +92,10 @@ export default function SettingsComponent() {
     },
     onError: (error) => {
       setPasswordButtonDisabled(false);
-      if (error.status === 401) 
+      // the session expired or its token was revoked
+      if (error.status === 403)
+        logout();
+      else if (error.status === 401) 
         setPasswordErrorMsg("old password is incorrect");
       else 
         setPasswordErrorMsg(error.message);
@@ -84,5 +84,11 @@ class ApiError extends Error {
     return await handleResponse(response);
   }
 
-  export default { get, put, post, form, _delete, putForm };
+  const socket = (url, token) => {
+    // browsers cannot set headers on WebSockets, so the token goes in the query
+    const query = token ? `?token=${encodeURIComponent(token)}` : "";
+    return new WebSocket(baseUrl.replace(/^http/, "ws") + url + query);
+  };
+
+  export default { get, put, post, form, _delete, putForm, socket };
   
\ No newline at end of file
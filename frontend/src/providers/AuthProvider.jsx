@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useCallback, useState } from "react";
 import PropTypes from "prop-types";
 import { AuthContext } from "../contexts";
 import { useEffect } from "react";
@@ -26,11 +26,11 @@ export default function AuthProvider({ children }) {
     localStorage.setItem(tokenKey, token);
     setLoggedIn(true);
   };
-  const logout = () => {
+  const logout = useCallback(() => {
     setToken(null);
     localStorage.removeItem(tokenKey);
     setLoggedIn(false);
-  };
+  }, []);
 
   useEffect(() => {
     const syncToken = () => {
@@ -44,7 +44,7 @@ export default function AuthProvider({ children }) {
   }, []);
 
   return (
-    <AuthContext.Provider value={{ headers, loggedIn, authLoaded, login, logout }}>
+    <AuthContext.Provider value={{ headers, token, loggedIn, authLoaded, login, logout }}>
       {children}
     </AuthContext.Provider>
   );
@@ -1,6 +1,6 @@
-import { useQuery } from "@tanstack/react-query";
+import { useInfiniteQuery, useQuery, useQueryClient } from "@tanstack/react-query";
 import api from "./api/api";
-import { useContext } from "react";
+import { useContext, useEffect } from "react";
 import { AuthContext } from "./contexts";
 
 
@@ -16,17 +16,128 @@ export const useChats = () => {
     return { chats, error };
 }
 
+// pages[0] is the newest page, later pages are older; each is in ascending order
+const applyMessageEvent = (data, event) => {
+    if (!data)
+        return data;
+    const pages = data.pages.map((page, index) => {
+        const messages = page.messages;
+        switch (event.type) {
+            case "message_created":
+                // also replayed by catch-up, so a message already shown is kept once
+                if (index === 0 && !data.pages.some((p) => p.messages.some((m) => m.id === event.message.id)))
+                    return { ...page, messages: [...messages, event.message] };
+                return page;
+            case "message_updated":
+                return { ...page, messages: messages.map((m) => m.id === event.message.id ? event.message : m) };
+            case "message_deleted":
+                return { ...page, messages: messages.filter((m) => m.id !== event.message.id) };
+            default:
+                return page;
+        }
+    });
+    return { ...data, pages };
+}
+
 export const useChatMessages = (chatId) => {
-    const { data, error } = useQuery({
+    const queryClient = useQueryClient();
+    const { data, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
         queryKey: ["messages", chatId],
-        queryFn: () => api.get(`/chats/${chatId}/messages`),
+        // the latest page first, then older ones through the keyset cursor
+        initialPageParam: null,
+        getNextPageParam: (page) => page.metadata.prev_cursor ?? undefined,
+        queryFn: async ({ pageParam }) => {
+            const before = pageParam ? `&before=${encodeURIComponent(pageParam)}` : "";
+            const data = await api.get(`/chats/${chatId}/messages?expand=authors${before}`);
+            // authors come embedded, so useUsername finds them cached instead of
+            // requesting /accounts/{id} once per message
+            data.messages.forEach(({ account_id, username }) => {
+                if (account_id != null)
+                    queryClient.setQueryData(["username", account_id], { id: account_id, username });
+            });
+            return data;
+        },
         retry: false,
     });
 
-    
-    const messages = (data?.messages || [].sort((a,b) => new Date(a.created_at) - newDate(b.created_at)));
-    
-    return { messages, error };
+    // new messages arrive over the chat's WebSocket instead of by re-fetching;
+    // after a reconnect, the changes missed meanwhile are read from the change
+    // log, starting from the sequence number current when the socket opened
+    const { token, logout } = useContext(AuthContext);
+    useEffect(() => {
+        if (!token)
+            return;
+        const apply = (event) => queryClient.setQueryData(["messages", chatId], (old) => applyMessageEvent(old, event));
+        let closing = false;
+        let socket = null;
+        let retry = null;
+        let attempts = 0;
+        let seq = null;
+
+        const catchUp = async () => {
+            if (seq === null) {
+                seq = (await api.get(`/chats/${chatId}/messages/changes`)).metadata.cursor;
+                return;
+            }
+            let hasMore = true;
+            while (hasMore && !closing) {
+                const { metadata, changes } = await api.get(`/chats/${chatId}/messages/changes?since=${seq}`);
+                changes.forEach((change) => apply({
+                    type: `message_${change.type}`,
+                    message: change.message ?? { id: change.message_id },
+                }));
+                seq = metadata.cursor;
+                hasMore = metadata.has_more;
+            }
+        };
+
+        const reconnect = () => {
+            // 1s, 2s, 4s... up to 30s between attempts
+            retry = setTimeout(connect, Math.min(1000 * 2 ** attempts, 30000));
+            attempts += 1;
+        };
+
+        const connect = () => {
+            socket = api.socket(`/chats/${chatId}/ws`, token);
+            socket.onopen = () => {
+                attempts = 0;
+                catchUp().catch(() => queryClient.invalidateQueries({ queryKey: ["messages", chatId] }));
+            };
+            socket.onmessage = (message) => apply(JSON.parse(message.data));
+            socket.onclose = (close) => {
+                if (closing)
+                    return;
+                // policy violation: either the token expired or was revoked, which
+                // means logging in again, or the account left the chat
+                if (close.code === 1008) {
+                    api.get("/accounts/me", { Authorization: `Bearer ${token}` }).then(
+                        () => queryClient.invalidateQueries({ queryKey: ["messages", chatId] }),
+                        (error) => [401, 403].includes(error.status) ? logout() : reconnect(),
+                    );
+                    return;
+                }
+                // evicted for falling behind (1013) or dropped: reopen and catch up
+                reconnect();
+            };
+        };
+
+        connect();
+        return () => {
+            closing = true;
+            clearTimeout(retry);
+            socket.close();
+        };
+    }, [chatId, token, logout, queryClient]);
+
+    const messages = [...(data?.pages || [])].reverse().flatMap((page) => page.messages);
+
+    return {
+        messages,
+        error,
+        loadOlder: fetchNextPage,
+        hasOlder: hasNextPage,
+        loadingOlder: isFetchingNextPage,
+    };
 }
 
 export const useChatMembers = (chatId) => {